@@ -0,0 +1,75 @@
+import argparse
+import os
+import sys
+import time
+from PIL import Image
+from functions.batch_operations import parse_operation, collect_images, run_batch
+from functions.export import ExportTarget
+from functions.recipes import load_recipe
+from functions.planner import plan_steps
+from functions.image_loader import oriented_size, has_alpha
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description='Apply Photo Editor operations and presets to many images without the GUI',
+        epilog='example: python batch.py photos/ "shots/*.jpg" --op "retro=0.7" --op "resize=1920,1280" -o out -f jpg'
+    )
+    parser.add_argument('inputs', nargs='+', help='input directories or glob patterns')
+    parser.add_argument('--recipe', help='JSON recipe saved from the editor, applied before any --op')
+    parser.add_argument('--op', dest='operations', action='append', default=[], metavar='NAME[=V1,V2,...]',
+                        help='operation from the editor (e.g. blur=0.5, "black & white", retro=0.8), applied in the given order')
+    parser.add_argument('-o', '--output', required=True, help='output directory')
+    parser.add_argument('-f', '--format', default='png', choices=['png', 'jpg', 'jpeg', 'webp'], help='output format')
+    parser.add_argument('-q', '--quality', type=int, default=95, help='JPEG and WebP quality (1-100)')
+    parser.add_argument('--compress-level', type=int, default=6, choices=range(10), metavar='0-9', help='PNG zlib compression level')
+    parser.add_argument('--progressive', action='store_true', help='write progressive JPEGs')
+    parser.add_argument('--optimize', action='store_true', help='spend extra encode time for smaller files')
+    parser.add_argument('--plan', action='store_true',
+                        help='let the planner fuse steps and move downscales ahead of expensive filters (results may differ slightly)')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1, help='worker processes')
+    args = parser.parse_args()
+
+    try:
+        steps = load_recipe(args.recipe) if args.recipe else []
+        steps += [parse_operation(operation) for operation in args.operations]
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+
+    if not steps:
+        parser.error('nothing to apply, give a --recipe or at least one --op')
+
+    target = ExportTarget(args.format, quality=args.quality, compress_level=args.compress_level, progressive=args.progressive, optimize=args.optimize)
+
+    paths = collect_images(args.inputs)
+    if not paths:
+        print('no images found', file=sys.stderr)
+        return 1
+
+    print(f'{len(paths)} images, {len(steps)} operations, {args.workers} workers')
+
+    if args.plan:
+        with Image.open(paths[0]) as image:
+            width, height = oriented_size(image)
+            alpha = has_alpha(image)
+        print(f'plan for {width}x{height}{" with alpha" if alpha else ""}:')
+        print(plan_steps(steps, width, height, alpha).describe())
+
+    failures = 0
+    start = time.perf_counter()
+
+    for done, (path, output_path, seconds, error) in enumerate(run_batch(paths, steps, args.output, target, args.workers, args.plan), 1):
+        if error is None:
+            print(f'[{done}/{len(paths)}] {path} -> {output_path} ({seconds:.2f}s)')
+        else:
+            failures += 1
+            print(f'[{done}/{len(paths)}] FAILED {path} ({seconds:.2f}s): {error}', file=sys.stderr)
+
+    elapsed = time.perf_counter() - start
+    print(f'done: {len(paths) - failures} ok, {failures} failed in {elapsed:.2f}s ({len(paths) / elapsed:.2f} images/s)')
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,182 @@
+import numpy as np
+import cv2
+import math
+from PIL import Image, ImageFilter
+from functools import lru_cache
+from typing import Callable, Optional
+
+
+# the operations presets are built from, as they were before presets were compiled:
+# every call runs on its own, with its own HSV round trip and alpha split,
+# kept so benchmarks.preset_compiler measures fused presets against the code they replaced
+
+
+def blur(image: np.ndarray, blur_factor: list[float]) -> np.ndarray:
+    pil_image = Image.fromarray(image)
+    blurred_image = pil_image.filter(ImageFilter.GaussianBlur(blur_factor[0]))
+    return np.array(blurred_image)
+
+
+def sharpen(image: np.ndarray, sharpen_factor: list[float]) -> np.ndarray:
+    sharpened_channels = []
+    for channel in cv2.split(image):
+        blurred_channel = cv2.GaussianBlur(channel, (0, 0), sharpen_factor[0])
+        unsharp_mask = cv2.addWeighted(channel, 1.0 + sharpen_factor[0], blurred_channel, -sharpen_factor[0], 0)
+        sharpened_channels.append(unsharp_mask)
+
+    return cv2.merge(sharpened_channels)
+
+
+def noise(image: np.ndarray, noise_intensity: list[float]) -> np.ndarray:
+    noise = np.random.normal(scale=noise_intensity[0], size=image.shape).astype(np.uint8)
+    noisy_image = cv2.add(image, noise)
+
+    if image.shape[2] == 4:
+        transparent_pixels = image[:, :, 3] == 0
+        noisy_image[transparent_pixels] = image[transparent_pixels]
+
+    return noisy_image
+
+
+def color_adjustments(image: np.ndarray, colors: list[float]) -> np.ndarray:
+    image = image.astype(np.float32)
+    image[:, :, 0] *= colors[0]
+    image[:, :, 1] *= colors[1]
+    image[:, :, 2] *= colors[2]
+
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def split_alpha(image: np.ndarray) -> tuple[np.ndarray, Optional[np.ndarray]]:
+    if image.shape[2] == 4:
+        return image[:, :, :3], image[:, :, 3]
+
+    return image, None
+
+
+def join_alpha(image: np.ndarray, alpha_channel: Optional[np.ndarray]) -> np.ndarray:
+    return image if alpha_channel is None else np.dstack((image, alpha_channel))
+
+
+def brightness(image: np.ndarray, brightness_factor: list[float]) -> np.ndarray:
+    bgr_image, alpha_channel = split_alpha(image)
+
+    hsv_image = cv2.cvtColor(bgr_image, cv2.COLOR_BGR2HSV)
+    hsv_image[:, :, 2] = np.clip(hsv_image[:, :, 2] + brightness_factor[0], 0, 255)
+    bgr_image = cv2.cvtColor(hsv_image, cv2.COLOR_HSV2BGR)
+
+    return join_alpha(bgr_image, alpha_channel)
+
+
+def saturation(image: np.ndarray, saturation_factor: list[float]) -> np.ndarray:
+    bgr_image, alpha_channel = split_alpha(image)
+
+    hsv_image = cv2.cvtColor(bgr_image, cv2.COLOR_BGR2HSV)
+    hsv_image[:, :, 1] = np.clip(hsv_image[:, :, 1] * saturation_factor[0], 0, 255)
+    bgr_image = cv2.cvtColor(hsv_image, cv2.COLOR_HSV2BGR)
+
+    return join_alpha(bgr_image, alpha_channel)
+
+
+def contrast(image: np.ndarray, contrast_factor: list[float]) -> np.ndarray:
+    bgr_image, alpha_channel = split_alpha(image)
+
+    contrast = contrast_factor[0]
+    brightness = int(round(255 * (1 - contrast) / 2))
+    adjusted = cv2.addWeighted(bgr_image, contrast, bgr_image, 0, brightness)
+
+    return join_alpha(adjusted, alpha_channel)
+
+
+@lru_cache(maxsize=4)
+def generate_gradient(
+        width: int,
+        height: int,
+        direction: str,
+        color_start: tuple[int, int, int],
+        color_end: tuple[int, int, int]
+    ) -> np.ndarray:
+
+    gradient = np.zeros((height, width, 3), dtype=np.uint8)
+
+    if direction == 'horizontal':
+        x = np.arange(width)
+        for channel in range(3):
+            gradient[:, :, channel] = np.interp(x, (0, width - 1), (color_start[channel], color_end[channel]))
+
+    elif direction == 'vertical':
+        y = np.arange(height)
+        for channel in range(3):
+            gradient[:, :, channel] = np.interp(y, (0, height - 1), (color_start[channel], color_end[channel]))[:, np.newaxis]
+
+    elif direction == 'diagonal':
+        x = np.arange(width) / width
+        y = np.arange(height) / height
+        t = np.minimum(x[np.newaxis, :], y[:, np.newaxis])
+        for channel in range(3):
+            gradient[:, :, channel] = color_start[channel] + t * (color_end[channel] - color_start[channel])
+
+    return gradient
+
+
+def hex_to_rgb(hex_color: str) -> tuple[int, int, int]:
+    hex_color = hex_color.lstrip('#')
+    return int(hex_color[0:2], 16), int(hex_color[2:4], 16), int(hex_color[4:6], 16)
+
+
+def gradient_overlay(image: np.ndarray, values: list) -> np.ndarray:
+    direction, first_color, second_color, opacity = values
+    gradient = generate_gradient(image.shape[1], image.shape[0], direction, hex_to_rgb(first_color), hex_to_rgb(second_color))
+
+    if image.shape[2] == 4:
+        blended_bgr = cv2.addWeighted(image[:, :, :3], 1 - opacity, gradient, opacity, 0)
+        alpha_mask = np.where(image[:, :, 3] > 0, 255, 0).astype(np.uint8)
+        return np.dstack((blended_bgr, alpha_mask))
+
+    return cv2.addWeighted(image, 1 - opacity, gradient, opacity, 0)
+
+
+def vignette(image: np.ndarray, vignette_intensity: list[float]) -> np.ndarray:
+    height, width = image.shape[:2]
+    y, x = np.ogrid[:height, :width]
+
+    center_x = width / 2
+    center_y = height / 2
+    distance = np.sqrt((x - center_x) ** 2 + (y - center_y) ** 2)
+
+    max_distance = math.sqrt(center_x ** 2 + center_y ** 2)
+    vignette_mask = np.clip(1 - vignette_intensity[0] * distance / max_distance, 0, 1)
+
+    image = image.copy()
+    for i in range(3):
+        image[:, :, i] = image[:, :, i] * vignette_mask
+
+    return image
+
+
+def sepia(image: np.ndarray, values: Optional[list] = None) -> np.ndarray:
+    sepia_matrix = np.array(
+        [
+            [0.6, 0.769, 0.189],
+            [0.5, 0.686, 0.168],
+            [0.4, 0.534, 0.131]
+        ]
+    )
+    bgr_image, alpha_channel = split_alpha(image)
+
+    sepia_image = np.clip(np.dot(bgr_image, sepia_matrix.T), 0, 255).astype(np.uint8)
+    return join_alpha(sepia_image, alpha_channel)
+
+
+baseline_operations: dict[str, Callable] = {
+    'blur': blur,
+    'sharpen': sharpen,
+    'noise': noise,
+    'color adjustments': color_adjustments,
+    'brightness': brightness,
+    'saturation': saturation,
+    'contrast': contrast,
+    'gradient overlay': gradient_overlay,
+    'vignette': vignette,
+    'sepia': sepia
+}
@@ -0,0 +1,55 @@
+import argparse
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+from benchmarks.images import synthetic_image, megapixels_to_size
+from functions.image_operations import PRESETS, apply_preset
+from functions.buffer_pool import frame_pool, set_buffering
+
+
+def measure(name: str, image: np.ndarray, strength: float, buffering: bool) -> tuple[float, float, int, int]:
+    set_buffering(buffering)
+    # warm the pool once so the measured run shows the steady state of an editing session
+    apply_preset(name, image, [strength])
+    frame_pool.reset_stats()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    apply_preset(name, image, [strength])
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return elapsed, peak / 1024 ** 2, frame_pool.unpooled + frame_pool.allocations, frame_pool.reuses
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Peak memory and frame allocations of presets with and without the buffer pool')
+    parser.add_argument('--megapixels', type=float, default=24)
+    parser.add_argument('--channels', type=int, choices=[3, 4], default=4)
+    parser.add_argument('--strength', type=float, default=0.7)
+    args = parser.parse_args()
+
+    width, height = megapixels_to_size(args.megapixels)
+    image = synthetic_image(width, height, args.channels)
+
+    print(f'{width}x{height}x{args.channels}, frame size {image.nbytes / 1024 ** 2:.0f} MB')
+    print(f'{"preset":<10}{"time s":>9}{"peak MB":>10}{"allocs":>8}{"pooled time s":>15}{"peak MB":>10}{"allocs":>8}{"reused":>8}')
+
+    for name in PRESETS:
+        before_time, before_peak, before_allocations, _ = measure(name, image, args.strength, False)
+        after_time, after_peak, after_allocations, reuses = measure(name, image, args.strength, True)
+
+        print(
+            f'{name:<10}{before_time:>9.3f}{before_peak:>10.0f}{before_allocations:>8}'
+            f'{after_time:>15.3f}{after_peak:>10.0f}{after_allocations:>8}{reuses:>8}'
+        )
+
+    set_buffering(True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
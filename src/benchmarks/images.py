@@ -0,0 +1,23 @@
+import numpy as np
+
+
+def synthetic_image(width: int, height: int, channels: int = 3, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    y, x = np.ogrid[:height, :width]
+    scale = max(width, height) / 16
+
+    image = np.empty((height, width, channels), dtype=np.uint8)
+    for channel in range(3):
+        wave = 127 + 100 * np.sin(x / scale + channel) * np.cos(y / (0.7 * scale) - channel)
+        image[:, :, channel] = np.clip(wave + rng.normal(0, 8, (height, width)), 0, 255)
+
+    if channels == 4:
+        image[:, :, 3] = 255
+        image[: height // 8, : width // 8, 3] = 0
+
+    return image
+
+
+def megapixels_to_size(megapixels: float) -> tuple[int, int]:
+    width = int(np.sqrt(megapixels * 1e6 * 3 / 2))
+    return width, int(width * 2 / 3)
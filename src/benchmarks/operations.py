@@ -0,0 +1,146 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+from benchmarks.images import synthetic_image, megapixels_to_size
+from functions.image_operations import image_processing_functions
+
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+LAYOUTS = {3: 'rgb', 4: 'rgba'}
+# timings of millisecond operations jitter by more than any sensible threshold
+MIN_REGRESSION_SECONDS = 0.005
+
+
+def operation_values(name: str, width: int, height: int) -> list | None:
+    match name:
+        case 'rotate' | 'inversion' | 'black & white' | 'sepia':
+            return None
+        case 'flip':
+            return [1]
+        case 'resize':
+            return [width // 2, height // 2]
+        case 'blur':
+            return [1.5]
+        case 'sharpen':
+            return [1.0]
+        case 'color adjustments':
+            return [1.1, 0.9, 1.0]
+        case 'hue':
+            return [30]
+        case 'brightness':
+            return [20]
+        case 'saturation' | 'contrast':
+            return [1.3]
+        case 'solid overlay':
+            return ['#943155', 0.3]
+        case 'gradient overlay':
+            return ['radial', '#519ec5', '#943155', 0.4]
+        case 'noise':
+            return [3.0, 0]
+        case 'vignette':
+            return [0.8]
+        case _:
+            return [0.7]
+
+
+def measure(name: str, image: np.ndarray, values: list | None, repeat: int) -> dict[str, float]:
+    operation = image_processing_functions[name]
+
+    # peak memory comes from a separate traced run, tracing slows the timed ones down
+    tracemalloc.start()
+    operation(image, values)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operation(image, values)
+        best = min(best, time.perf_counter() - start)
+
+    megapixels = image.shape[0] * image.shape[1] / 1e6
+    return {'seconds': best, 'peak_mb': peak / 1024 ** 2, 'mp_per_s': megapixels / best}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+
+        slower = result['seconds'] - reference['seconds']
+        if result['seconds'] > reference['seconds'] * (1 + threshold) and slower > MIN_REGRESSION_SECONDS:
+            regressions.append(f'{key}: {reference["seconds"]:.3f}s -> {result["seconds"]:.3f}s')
+        if result['peak_mb'] > reference['peak_mb'] * (1 + threshold):
+            regressions.append(f'{key}: {reference["peak_mb"]:.0f} MB -> {result["peak_mb"]:.0f} MB peak')
+
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Benchmark every operation of the editor and compare against a JSON baseline')
+    parser.add_argument('--megapixels', type=float, nargs='+', default=[1, 12, 24, 50])
+    parser.add_argument('--channels', type=int, nargs='+', choices=[3, 4], default=[3, 4])
+    parser.add_argument('--operations', nargs='+', default=list(image_processing_functions), metavar='NAME')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline JSON to compare with (and to write with --save)')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed slowdown or memory growth, 0.25 = 25%%')
+    parser.add_argument('--save', action='store_true', help='write the results as the new baseline')
+    args = parser.parse_args()
+
+    unknown = [name for name in args.operations if name not in image_processing_functions]
+    if unknown:
+        parser.error(f'unknown operations: {", ".join(unknown)}')
+
+    results = {}
+    print(f'{"operation":<18}{"size":>8}{"layout":>7}{"time s":>10}{"peak MB":>10}{"MP/s":>9}')
+
+    for megapixels in args.megapixels:
+        width, height = megapixels_to_size(megapixels)
+
+        for channels in args.channels:
+            image = synthetic_image(width, height, channels)
+
+            for name in args.operations:
+                key = f'{name}/{megapixels:g}MP/{LAYOUTS[channels]}'
+                result = measure(name, image, operation_values(name, width, height), args.repeat)
+                results[key] = result
+
+                print(
+                    f'{name:<18}{f"{megapixels:g} MP":>8}{LAYOUTS[channels]:>7}'
+                    f'{result["seconds"]:>10.3f}{result["peak_mb"]:>10.0f}{result["mp_per_s"]:>9.1f}'
+                )
+
+            del image
+
+    if args.save:
+        with open(args.baseline, 'w') as file:
+            json.dump({'platform': platform.platform(), 'cpu_count': os.cpu_count(), 'results': results}, file, indent=2)
+        print(f'baseline written to {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f'no baseline at {args.baseline}, run with --save to create one')
+        return 0
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)['results']
+
+    regressions = compare(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f'REGRESSION {regression}', file=sys.stderr)
+
+    print(f'{len(regressions)} regressions over {args.threshold:.0%} against {args.baseline}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
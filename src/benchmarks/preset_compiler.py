@@ -0,0 +1,68 @@
+import argparse
+import sys
+import time
+import numpy as np
+
+from benchmarks.images import synthetic_image, megapixels_to_size
+from functions.image_operations import preset_steps, image_processing_functions
+from functions.preset_compiler import run_preset, run_chained
+from benchmarks.baseline_operations import baseline_operations
+
+
+PRESETS = ['vintage', 'retro', 'mojave', 'nostalgia', 'clean', 'neon', 'twilight']
+
+# fused runs merge neighbouring steps of the same colour space and skip the uint8 HSV round trips
+# between them, so outputs may drift slightly from the chained calls; steps that alternate HSV and RGB
+# still run one by one, so the fused time is reported against the chained calls as well as against
+# the operations as they were before presets were compiled
+MEAN_TOLERANCE = 2.5
+P99_TOLERANCE = 16
+
+
+def time_run(run, image: np.ndarray, steps: list, repeat: int, operations: dict = image_processing_functions) -> tuple[float, np.ndarray]:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run(image, steps, operations)
+        best = min(best, time.perf_counter() - start)
+
+    return best, result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Compare compiled presets with chained operation calls')
+    parser.add_argument('--megapixels', type=float, default=12)
+    parser.add_argument('--channels', type=int, choices=[3, 4], default=3)
+    parser.add_argument('--strength', type=float, default=0.7)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    width, height = megapixels_to_size(args.megapixels)
+    image = synthetic_image(width, height, args.channels)
+    failed = False
+
+    print(f'{width}x{height}x{args.channels}, tolerance: mean <= {MEAN_TOLERANCE}, p99 <= {P99_TOLERANCE}')
+    print(f'{"preset":<10}{"baseline s":>12}{"chained s":>11}{"fused s":>10}{"vs base":>9}{"vs chain":>10}{"mean":>8}{"p99":>6}{"max":>6}')
+
+    for name in PRESETS:
+        # a fixed seed, so vintage draws the same noise in both runs
+        steps = preset_steps(name, [args.strength, 0])
+        baseline_time, _ = time_run(run_chained, image, steps, args.repeat, baseline_operations)
+        chained_time, chained = time_run(run_chained, image, steps, args.repeat)
+        fused_time, fused = time_run(run_preset, image, steps, args.repeat)
+
+        error = np.abs(chained.astype(np.int16) - fused)
+        mean, p99 = error.mean(), np.percentile(error, 99)
+        ok = mean <= MEAN_TOLERANCE and p99 <= P99_TOLERANCE
+        failed = failed or not ok
+
+        print(
+            f'{name:<10}{baseline_time:>12.3f}{chained_time:>11.3f}{fused_time:>10.3f}{baseline_time / fused_time:>8.2f}x{chained_time / fused_time:>9.2f}x'
+            f'{mean:>8.2f}{p99:>6.0f}{error.max():>6}{"" if ok else "  FAIL"}'
+        )
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
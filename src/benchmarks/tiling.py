@@ -0,0 +1,72 @@
+import argparse
+import os
+import time
+import cv2
+
+from benchmarks.images import synthetic_image, megapixels_to_size
+from functions.image_operations import image_processing_functions
+from functions.tiling import set_tile_workers
+
+
+OPERATIONS = [
+    ('blur', [1.5]),
+    ('sharpen', [1.0]),
+    ('vignette', [0.8]),
+    ('contrast', [1.3]),
+    ('retro', [0.7])
+]
+
+
+def worker_counts(maximum: int) -> list[int]:
+    counts = [1]
+    while counts[-1] * 2 <= maximum:
+        counts.append(counts[-1] * 2)
+
+    if counts[-1] != maximum:
+        counts.append(maximum)
+
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Measure tiled operation throughput from 1 to N threads')
+    parser.add_argument('--megapixels', type=float, nargs='+', default=[50, 100, 200])
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--repeat', type=int, default=2)
+    args = parser.parse_args()
+
+    counts = worker_counts(args.max_workers)
+
+    # OpenCV's own thread pool would run inside every tile and hide how tiling scales,
+    # so it is pinned to one thread for the sweep and restored afterwards
+    previous_threads = cv2.getNumThreads()
+    cv2.setNumThreads(1)
+
+    try:
+        for megapixels in args.megapixels:
+            width, height = megapixels_to_size(megapixels)
+            image = synthetic_image(width, height)
+            print(f'\n{width}x{height} ({megapixels} MP), throughput in MP/s')
+            print(f'{"operation":<12}' + ''.join(f'{f"{count} thr":>10}' for count in counts) + f'{"scaling":>10}')
+
+            for name, values in OPERATIONS:
+                throughputs = []
+                for count in counts:
+                    set_tile_workers(count)
+                    best = float('inf')
+                    for _ in range(args.repeat):
+                        start = time.perf_counter()
+                        image_processing_functions[name](image, values)
+                        best = min(best, time.perf_counter() - start)
+                    throughputs.append(megapixels / best)
+
+                row = ''.join(f'{throughput:>10.1f}' for throughput in throughputs)
+                print(f'{name:<12}{row}{throughputs[-1] / throughputs[0]:>9.2f}x')
+
+            del image
+    finally:
+        cv2.setNumThreads(previous_threads)
+
+
+if __name__ == '__main__':
+    main()
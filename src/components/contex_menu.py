@@ -4,7 +4,7 @@ import numpy as np
 from typing import Optional
 
 from components.buttons import MyButton
-from functions.image_operations import add_image_operation
+from functions.files_operations import add_image_operation, preview_operation
 
 
 def build_resize(name: str, photo_arr: ft.Ref[np.ndarray], photo_flet: ft.Image, width_input: ft.TextField, height_input: ft.TextField, check: bool) -> ft.Container:
@@ -32,7 +32,10 @@ def build_slider(
         value: Optional[float] = None
     ) -> ft.Container:
 
-    slider = ft.Slider(min=min, max=max, divisions=division, label=label, round=round, value=value, active_color='#dedede')
+    slider = ft.Slider(
+        min=min, max=max, divisions=division, label=label, round=round, value=value, active_color='#dedede',
+        on_change=lambda _: preview_operation(name, photo_flet, [slider.value])
+    )
 
     apply_button = MyButton('apply')
     apply_button.define_onclick(lambda _: add_image_operation(name, photo_arr, photo_flet, [slider.value]))
@@ -51,9 +54,10 @@ def build_slider(
 
 
 def build_color_sliders(name: str, photo_arr: ft.Ref[np.ndarray], photo_flet: ft.Image) -> ft.Container:
-    red = ft.Slider(min=0, max=2, divisions=510, label="{value}", value=1, round=3, height=20, active_color='#dedede')
-    green = ft.Slider(min=0, max=2, divisions=510, label="{value}", value=1, round=3, height=20, active_color='#dedede')
-    blue = ft.Slider(min=0, max=2, divisions=510, label="{value}", value=1, round=3, height=20, active_color='#dedede')
+    preview = lambda _: preview_operation(name, photo_flet, [red.value, green.value, blue.value])
+    red = ft.Slider(min=0, max=2, divisions=510, label="{value}", value=1, round=3, height=20, active_color='#dedede', on_change=preview)
+    green = ft.Slider(min=0, max=2, divisions=510, label="{value}", value=1, round=3, height=20, active_color='#dedede', on_change=preview)
+    blue = ft.Slider(min=0, max=2, divisions=510, label="{value}", value=1, round=3, height=20, active_color='#dedede', on_change=preview)
 
     apply_button = MyButton('apply')
     apply_button.define_onclick(lambda _: add_image_operation(name, photo_arr, photo_flet, [red.value, green.value, blue.value]))
@@ -1,10 +1,16 @@
+import os
 import flet as ft
 import numpy as np
 from PIL import Image
+from typing import Optional
 from components.buttons import MyButton
 from components.contex_menu import build_content, build_resize
-from functions.image_operations import add_image_operation
-from functions.files_operations import undo_command, redo_command, pick_files_open, pick_file_save
+from functions.profiling import set_tracing, set_status_listener, export_trace
+from functions.batch_session import BatchSession, FAILED
+from functions.files_operations import add_image_operation, undo_command, redo_command, cancel_command, end_preview, set_busy_indicator, pick_files_open, pick_file_save, pick_recipe_save, pick_recipe_open, apply_batch, cancel_batch, zoom_view, pan_view, reset_view, CANVAS_WIDTH, CANVAS_HEIGHT
+
+ZOOM_STEP = 1.25
+
 
 class GUIBuilder:
 
@@ -18,8 +24,18 @@ class GUIBuilder:
         self.page = page
         self.original_path = orig_path
         self.current_path = curr_path
-        self.image_flet = ft.Image(src=self.original_path)
+        self.image_flet = ft.Image(src=self.original_path, fit=ft.ImageFit.FILL)
         self.image_arr = image_arr
+        self.save_progress = ft.ProgressBar(width=200, color='#943155', bgcolor='#29292b', visible=False)
+        self.busy_ring = ft.ProgressRing(width=20, height=20, stroke_width=2, color='#943155', visible=False)
+        self.status_bar = ft.Text(size=12, color='#dedede', visible=False)
+        self.web_copies = ft.Checkbox(label='Web copies', value=False, fill_color='#943155')
+        self.batch_session = None
+        self.batch_title = ft.Text(size=14, color='#dedede')
+        self.batch_list = ft.ListView(height=140, spacing=2)
+        self.batch_rows = {}
+        self.batch_panel = ft.Column(visible=False)
+        set_busy_indicator(self.show_busy)
 
         self.width_input_field = ft.TextField(
             label="width",
@@ -46,25 +62,38 @@ class GUIBuilder:
                 self.image_arr,
                 self.width_input_field,
                 self.height_input_field,
+                self.show_batch,
                 e
             ),
         )
         self.save_picker = ft.FilePicker(
             on_result=lambda e: pick_file_save( 
                 self.image_flet,
-                self.image_arr, 
+                self.save_progress,
+                self.web_copies,
+                self.show_message,
                 e
             )
         )
+        self.trace_picker = ft.FilePicker(
+            on_result=lambda e: export_trace(e.path if e.path.endswith('.json') else e.path + '.json') if e.path else None
+        )
+        self.recipe_save_picker = ft.FilePicker(on_result=lambda e: pick_recipe_save(self.show_message, e))
+        self.recipe_open_picker = ft.FilePicker(
+            on_result=lambda e: pick_recipe_open(self.image_arr, self.image_flet, self.show_message, e)
+        )
         self.page.overlay.append(self.open_picker)
+        self.page.overlay.append(self.recipe_save_picker)
+        self.page.overlay.append(self.recipe_open_picker)
         self.page.overlay.append(self.save_picker)
+        self.page.overlay.append(self.trace_picker)
 
     
     def open_btn(self) -> MyButton:
         open_btn = MyButton('Open photo')
         open_btn.define_onclick(
             lambda _: self.open_picker.pick_files(
-                allow_multiple=False,
+                allow_multiple=True,
                 allowed_extensions=['png', 'jpg', 'jpeg']
             )
         )
@@ -76,13 +105,118 @@ class GUIBuilder:
         save_btn = MyButton('Save photo')
         save_btn.define_onclick(
             lambda _: self.save_picker.save_file(
-                allowed_extensions=['png', 'jpg', 'jpeg']
+                allowed_extensions=['png', 'jpg', 'jpeg', 'webp']
             )
         )
 
         return save_btn
 
 
+    def recipe_buttons(self) -> list[ft.OutlinedButton]:
+        save_recipe = MyButton('Save recipe')
+        save_recipe.define_onclick(
+            lambda _: self.recipe_save_picker.save_file(
+                file_name='recipe.json',
+                allowed_extensions=['json']
+            )
+        )
+
+        load_recipe = MyButton('Apply recipe')
+        load_recipe.define_onclick(
+            lambda _: self.recipe_open_picker.pick_files(
+                allow_multiple=False,
+                allowed_extensions=['json']
+            )
+        )
+
+        return [save_recipe.build_file(), load_recipe.build_file()]
+
+
+    def trace_btn(self) -> MyButton:
+        trace_btn = MyButton('Export trace')
+        trace_btn.define_onclick(
+            lambda _: self.trace_picker.save_file(
+                file_name='trace.json',
+                allowed_extensions=['json']
+            )
+        )
+
+        return trace_btn
+
+
+    def profile_switch(self) -> ft.Switch:
+        return ft.Switch(
+            label='Profile',
+            active_color='#943155',
+            on_change=lambda e: self.toggle_profiling(e.control.value)
+        )
+
+
+    def toggle_profiling(self, enabled: bool) -> None:
+        set_tracing(enabled)
+        set_status_listener(self.show_status if enabled else None)
+
+        self.status_bar.value = 'profiling on, apply an operation to see where the time goes' if enabled else ''
+        self.status_bar.visible = enabled
+        self.status_bar.update()
+
+
+    def show_status(self, text: str) -> None:
+        self.status_bar.value = text
+        self.status_bar.update()
+
+
+    def show_message(self, text: str) -> None:
+        self.status_bar.value = text
+        self.status_bar.visible = True
+        self.status_bar.update()
+
+
+    def show_batch(self, session: Optional[BatchSession]) -> None:
+        self.batch_session = session
+        self.batch_rows = {}
+        self.batch_list.controls.clear()
+
+        if session is not None:
+            self.batch_title.value = f'Batch of {len(session.paths)} photos - edit the opened one, then apply the edit to all'
+            for path in session.paths:
+                state = ft.Text('', size=12, width=80, color='#519ec5')
+                detail = ft.Text('', size=12, color='#dedede')
+                self.batch_rows[path] = (state, detail)
+                self.batch_list.controls.append(ft.Row([state, ft.Text(os.path.basename(path), size=12, width=320, color='#dedede'), detail]))
+
+        self.batch_panel.visible = session is not None
+        self.batch_panel.update()
+
+
+    def update_batch(self, path: str, state: str, detail: str) -> None:
+        state_text, detail_text = self.batch_rows[path]
+        state_text.value = state
+        state_text.color = '#943155' if state == FAILED else '#519ec5'
+        detail_text.value = detail
+        self.batch_list.update()
+
+
+    def finish_batch(self) -> None:
+        self.batch_title.value = self.batch_session.summary()
+        self.batch_title.update()
+
+
+    def batch_controls(self) -> ft.Column:
+        apply = MyButton('Apply to all')
+        apply.define_onclick(lambda _: apply_batch(self.update_batch, self.finish_batch))
+
+        cancel = MyButton('Cancel batch')
+        cancel.define_onclick(lambda _: cancel_batch())
+
+        self.batch_panel.controls = [
+            ft.Row([self.batch_title, apply.build_file(), cancel.build_file()]),
+            self.batch_list
+        ]
+
+        return self.batch_panel
+
+
     def navbar(self, button1: MyButton, button2: MyButton) -> ft.Container:
         return ft.Container(
             width=self.page.window_max_width,
@@ -93,12 +227,23 @@ class GUIBuilder:
                     ft.Image(src='assets/Logo.png'),
                     button1.build_file(),
                     button2.build_file(),
-                    self.original_path
+                    *self.recipe_buttons(),
+                    self.web_copies,
+                    self.original_path,
+                    self.save_progress,
+                    self.busy_ring,
+                    self.profile_switch(),
+                    self.trace_btn().build_file()
                 ],   
             ),
         )
 
 
+    def show_busy(self, busy: bool) -> None:
+        self.busy_ring.visible = busy
+        self.busy_ring.update()
+
+
     def operation_btn(self, operation: str, cont: ft.Container) -> ft.FilledButton:
         operation_btn = MyButton(operation)
         if operation not in ['rotate', 'black & white', 'sepia', 'inversion']:
@@ -158,6 +303,9 @@ class GUIBuilder:
         cont.bgcolor = '#3f617b' if cont.bgcolor == '#943155' else '#943155'
         cont.update()
 
+        if cont.height == 3:
+            end_preview(self.image_arr, self.image_flet)
+
 
     def type_divider(self, text: str) -> ft.Column:
         return ft.Column(
@@ -220,6 +368,7 @@ class GUIBuilder:
     def undo_redo_buttons(self) -> ft.Row:
         undo_icon = ft.Icon(ft.icons.UNDO_ROUNDED, color=ft.colors.WHITE, size=20)
         redo_icon = ft.Icon(ft.icons.REDO_ROUNDED, color=ft.colors.WHITE, size=20)
+        cancel_icon = ft.Icon(ft.icons.CLOSE_ROUNDED, color=ft.colors.WHITE, size=20)
 
         undo = MyButton()
         undo.define_onclick(lambda _: undo_command(self.image_arr, self.image_flet))
@@ -227,10 +376,14 @@ class GUIBuilder:
         redo = MyButton()
         redo.define_onclick(lambda _: redo_command(self.image_arr, self.image_flet))
 
+        cancel = MyButton()
+        cancel.define_onclick(lambda _: cancel_command())
+
         undo = undo.build_command(undo_icon)
         redo = redo.build_command(redo_icon)
+        cancel = cancel.build_command(cancel_icon)
 
-        return ft.Row(controls=[undo, redo])
+        return ft.Row(controls=[undo, redo, cancel])
     
 
     def static_sidebar(self) -> ft.Container:
@@ -240,7 +393,7 @@ class GUIBuilder:
                 bgcolor='#29292b',
                 content=ft.Container(
                     content=self.undo_redo_buttons(),
-                    margin=ft.margin.only(left=60)
+                    margin=ft.margin.only(left=24)
                 )
         )
     
@@ -268,20 +421,31 @@ class GUIBuilder:
 
     def canvas(self) -> ft.Container:
         return ft.Container(
-            width=1400,
-            height=780,
+            width=CANVAS_WIDTH,
+            height=CANVAS_HEIGHT,
             bgcolor=ft.colors.TRANSPARENT,
             border=ft.border.all(width=0.2, color='white'),
-            padding=10,
-            content=self.image_flet
+            content=ft.GestureDetector(
+                content=ft.Container(content=self.image_flet, alignment=ft.alignment.center, width=CANVAS_WIDTH, height=CANVAS_HEIGHT),
+                mouse_cursor=ft.MouseCursor.MOVE,
+                drag_interval=30,
+                on_scroll=self.zoom_canvas,
+                on_pan_update=lambda e: pan_view(self.image_flet, e.delta_x, e.delta_y),
+                on_double_tap=lambda _: reset_view(self.image_flet)
+            )
         )
 
 
+    def zoom_canvas(self, e: ft.ScrollEvent) -> None:
+        if e.scroll_delta_y:
+            zoom_view(self.image_flet, ZOOM_STEP if e.scroll_delta_y < 0 else 1 / ZOOM_STEP, e.local_x, e.local_y)
+
+
     def background(self) -> ft.Container:
         return ft.Container(
                 width=1650,
                 height=1050,
-                content=self.canvas(),
+                content=ft.Column(controls=[self.canvas(), self.status_bar, self.batch_controls()], tight=True),
                 alignment=ft.alignment.Alignment(0, -0.4)
         )
 
@@ -0,0 +1,66 @@
+import numpy as np
+from typing import Callable, Optional
+
+
+ColorFunction = Callable[[np.ndarray], np.ndarray]
+# takes the colour channels and a destination buffer (or None) for the result
+BufferedColorFunction = Callable[[np.ndarray, Optional[np.ndarray]], np.ndarray]
+
+
+def split_alpha(image: np.ndarray) -> tuple[np.ndarray, Optional[np.ndarray]]:
+    if image.ndim == 3 and image.shape[2] == 4:
+        return image[:, :, :3], image[:, :, 3]
+
+    return image, None
+
+
+def merge_alpha(color: np.ndarray, alpha: Optional[np.ndarray], out: Optional[np.ndarray] = None) -> np.ndarray:
+    if alpha is None:
+        return color
+
+    if out is None:
+        out = np.empty(color.shape[:2] + (4,), dtype=color.dtype)
+
+    out[:, :, :3] = color
+    out[:, :, 3] = alpha
+
+    return out
+
+
+def apply_color(image: np.ndarray, color_func: BufferedColorFunction, out: Optional[np.ndarray] = None) -> np.ndarray:
+    # the colour channels are passed on as a view, alpha is written straight into the output
+    color, alpha = split_alpha(image)
+    if alpha is None:
+        return color_func(color, out)
+
+    return merge_alpha(color_func(color, None), alpha, out)
+
+
+def premultiply(image: np.ndarray) -> np.ndarray:
+    color, alpha = split_alpha(image)
+    out = np.empty_like(image)
+
+    out[:, :, :3] = (color.astype(np.uint16) * alpha[:, :, np.newaxis] + 127) // 255
+    out[:, :, 3] = alpha
+
+    return out
+
+
+def unpremultiply(image: np.ndarray) -> np.ndarray:
+    color, alpha = split_alpha(image)
+    out = np.zeros_like(image)
+
+    alpha_wide = alpha[:, :, np.newaxis].astype(np.uint32)
+    visible = alpha > 0
+    out[:, :, :3][visible] = np.minimum((color.astype(np.uint32) * 255 + alpha_wide // 2) // np.maximum(alpha_wide, 1), 255)[visible]
+    out[:, :, 3] = alpha
+
+    return out
+
+
+def apply_premultiplied(image: np.ndarray, image_func: ColorFunction) -> np.ndarray:
+    # neighbourhood filters on premultiplied colour keep transparent pixels from bleeding into visible ones
+    if split_alpha(image)[1] is None:
+        return image_func(image)
+
+    return unpremultiply(image_func(premultiply(image)))
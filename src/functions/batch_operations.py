@@ -0,0 +1,94 @@
+import os
+import glob
+import time
+import cv2
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterator, Optional
+from functions.image_operations import apply_steps, image_processing_functions
+from functions.preset_compiler import Step
+from functions.tiling import set_tile_workers
+from functions.image_loader import load_full
+from functions.export import ExportTarget, encode_target
+from functions.planner import plan_steps, run_plan
+from functions.recipes import check_values
+
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+# (input path, output path, seconds, error)
+BatchResult = tuple[str, Optional[str], float, Optional[str]]
+
+
+def parse_operation(text: str) -> Step:
+    name, _, arguments = text.partition('=')
+    name = name.strip()
+
+    if name not in image_processing_functions:
+        raise ValueError(f'unknown operation: {name}')
+
+    if not arguments:
+        return name, None
+
+    values = []
+    for argument in arguments.split(','):
+        try:
+            values.append(float(argument))
+        except ValueError:
+            values.append(argument.strip())
+
+    # command line steps are held to the same rules as recipe steps
+    return name, check_values(name, values)
+
+
+def collect_images(inputs: list[str]) -> list[str]:
+    paths = []
+
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            candidates = sorted(os.path.join(pattern, file) for file in os.listdir(pattern))
+        else:
+            candidates = sorted(glob.glob(pattern))
+
+        paths.extend(path for path in candidates if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS))
+
+    return list(dict.fromkeys(paths))
+
+
+def output_path_for(path: str, output_dir: str, target: ExportTarget) -> str:
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return target.path_for(os.path.join(output_dir, stem))
+
+
+def process_file(path: str, steps: list[Step], output_dir: str, target: ExportTarget, optimize: bool = False) -> BatchResult:
+    start = time.perf_counter()
+
+    try:
+        image = load_full(path)
+        if optimize:
+            image = run_plan(image, plan_steps(steps, image.shape[1], image.shape[0], image.shape[2] == 4))
+        else:
+            image = apply_steps(image, steps)
+
+        output_path = output_path_for(path, output_dir, target)
+        result = encode_target(image, output_path, target)
+        if result.error is not None:
+            return path, None, time.perf_counter() - start, result.error
+    except Exception as error:
+        return path, None, time.perf_counter() - start, f'{type(error).__name__}: {error}'
+
+    return path, output_path, time.perf_counter() - start, None
+
+
+def init_worker() -> None:
+    # parallelism comes from the process pool, keep each worker single threaded
+    set_tile_workers(1)
+    cv2.setNumThreads(1)
+
+
+def run_batch(paths: list[str], steps: list[Step], output_dir: str, target: ExportTarget, workers: int, optimize: bool = False) -> Iterator[BatchResult]:
+    os.makedirs(output_dir, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        futures = [pool.submit(process_file, path, steps, output_dir, target, optimize) for path in paths]
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,142 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Optional
+from functions.batch_operations import BatchResult, init_worker, process_file
+from functions.export import ExportTarget
+from functions.preset_compiler import Step
+
+
+OUTPUT_FOLDER = 'edited'
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+# path, state, detail
+UpdateCallback = Callable[[str, str, str], None]
+
+
+class BatchSession:
+    paths: list[str]
+    output_dir: str
+    workers: int
+    lock: threading.RLock
+    states: dict[str, str]
+    queue: list[str]
+    pool: Optional[ProcessPoolExecutor]
+    running: int
+    steps: list[Step]
+    on_update: Optional[UpdateCallback]
+    on_finish: Optional[Callable[[], None]]
+
+    def __init__(self, paths: list[str], output_dir: Optional[str] = None, workers: Optional[int] = None) -> None:
+        self.paths = paths
+        self.output_dir = output_dir or os.path.join(os.path.dirname(paths[0]), OUTPUT_FOLDER)
+        self.workers = workers or os.cpu_count() or 1
+        self.lock = threading.RLock()
+        self.states = {path: QUEUED for path in paths}
+        self.queue = []
+        self.pool = None
+        self.running = 0
+        self.steps = []
+        self.on_update = None
+        self.on_finish = None
+
+    @property
+    def busy(self) -> bool:
+        with self.lock:
+            return self.pool is not None
+
+    def start(self, steps: list[Step], on_update: UpdateCallback, on_finish: Callable[[], None]) -> bool:
+        with self.lock:
+            if self.pool is not None:
+                return False
+
+            os.makedirs(self.output_dir, exist_ok=True)
+            self.steps = steps
+            self.on_update = on_update
+            self.on_finish = on_finish
+            self.queue = list(self.paths)
+            self.states = {path: QUEUED for path in self.paths}
+            # the GUI process runs Flet and worker threads, which a forked child would inherit mid-flight
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker, mp_context=multiprocessing.get_context('spawn'))
+
+            # only as many files as there are workers are in flight, so at most that many full-resolution images exist at once
+            for _ in range(min(self.workers, len(self.queue))):
+                self.submit_next()
+            states = dict(self.states)
+
+        for path, state in states.items():
+            on_update(path, state, '')
+
+        return True
+
+    def submit_next(self) -> Optional[str]:
+        if not self.queue:
+            return None
+
+        path = self.queue.pop(0)
+        target = ExportTarget(os.path.splitext(path)[1])
+        future = self.pool.submit(process_file, path, self.steps, self.output_dir, target)
+        future.add_done_callback(lambda future: self.finished(path, future))
+
+        self.states[path] = RUNNING
+        self.running += 1
+        return path
+
+    def finished(self, path: str, future: Future) -> None:
+        if future.cancelled():
+            state, detail = CANCELLED, ''
+        elif future.exception() is not None:
+            state, detail = FAILED, str(future.exception())
+        else:
+            result: BatchResult = future.result()
+            _, output_path, seconds, error = result
+            state = DONE if error is None else FAILED
+            detail = f'{os.path.basename(output_path)} in {seconds:.2f}s' if error is None else error
+
+        with self.lock:
+            self.states[path] = state
+            self.running -= 1
+            started = self.submit_next() if self.pool is not None else None
+            done = self.running == 0 and not self.queue
+            if done:
+                self.close()
+
+        self.on_update(path, state, detail)
+        if started is not None:
+            self.on_update(started, RUNNING, '')
+        if done:
+            self.on_finish()
+
+    def cancel(self) -> None:
+        # files already being processed finish, everything still queued is dropped
+        with self.lock:
+            if self.pool is None:
+                return
+
+            dropped, self.queue = self.queue, []
+            for path in dropped:
+                self.states[path] = CANCELLED
+            done = self.running == 0
+            if done:
+                self.close()
+
+        for path in dropped:
+            self.on_update(path, CANCELLED, '')
+        if done:
+            self.on_finish()
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=False)
+        self.pool = None
+
+    def summary(self) -> str:
+        with self.lock:
+            counts = {state: list(self.states.values()).count(state) for state in (DONE, FAILED, CANCELLED)}
+
+        return f'{counts[DONE]} saved to {self.output_dir}, {counts[FAILED]} failed, {counts[CANCELLED]} cancelled'
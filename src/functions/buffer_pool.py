@@ -0,0 +1,65 @@
+import threading
+import numpy as np
+
+
+MAX_FREE_FRAMES = 3
+
+BufferKey = tuple[tuple[int, ...], str]
+
+
+class BufferPool:
+    lock: threading.Lock
+    free: dict[BufferKey, list[np.ndarray]]
+    enabled: bool
+    allocations: int
+    reuses: int
+    unpooled: int
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.free = {}
+        self.enabled = True
+        self.reset_stats()
+
+    def acquire(self, shape: tuple[int, ...], dtype: np.dtype = np.uint8) -> np.ndarray:
+        key = (tuple(shape), np.dtype(dtype).str)
+
+        with self.lock:
+            frames = self.free.get(key)
+            if frames:
+                self.reuses += 1
+                return frames.pop()
+
+            self.allocations += 1
+
+        return np.empty(shape, dtype=dtype)
+
+    def release(self, frame: np.ndarray) -> None:
+        key = (frame.shape, frame.dtype.str)
+
+        with self.lock:
+            frames = self.free.setdefault(key, [])
+            if len(frames) < MAX_FREE_FRAMES and not any(frame is free_frame for free_frame in frames):
+                frames.append(frame)
+
+    def count_unpooled(self) -> None:
+        with self.lock:
+            self.unpooled += 1
+
+    def clear(self) -> None:
+        with self.lock:
+            self.free.clear()
+
+    def reset_stats(self) -> None:
+        self.allocations = 0
+        self.reuses = 0
+        self.unpooled = 0
+
+
+frame_pool = BufferPool()
+
+
+def set_buffering(enabled: bool) -> None:
+    frame_pool.enabled = enabled
+    if not enabled:
+        frame_pool.clear()
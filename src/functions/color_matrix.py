@@ -0,0 +1,89 @@
+import numpy as np
+import cv2
+from typing import Optional
+
+
+MATRIX_OPERATIONS = ('sepia', 'black & white')
+FOLDABLE_OPERATIONS = ('color adjustments', 'inversion')
+
+SEPIA = np.array(
+    [
+        [0.6, 0.769, 0.189, 0],
+        [0.5, 0.686, 0.168, 0],
+        [0.4, 0.534, 0.131, 0]
+    ]
+)
+
+# cv2.COLOR_BGR2GRAY weights, applied to the channels in memory order
+GRAYSCALE = np.array(
+    [
+        [0.114, 0.587, 0.299, 0],
+        [0.114, 0.587, 0.299, 0],
+        [0.114, 0.587, 0.299, 0]
+    ]
+)
+
+
+def compile_matrix(name: str, values: Optional[list]) -> np.ndarray:
+    match name:
+        case 'sepia':
+            return SEPIA.copy()
+        case 'black & white':
+            return GRAYSCALE.copy()
+        case 'color adjustments':
+            return np.hstack((np.diag(values[:3]), np.zeros((3, 1))))
+        case 'inversion':
+            return np.hstack((-np.eye(3), np.full((3, 1), 255.0)))
+
+
+def fold_matrices(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    linear = second[:, :3] @ first[:, :3]
+    offset = second[:, :3] @ first[:, 3] + second[:, 3]
+
+    return np.hstack((linear, offset[:, np.newaxis]))
+
+
+def dominant_channel(matrix: np.ndarray) -> Optional[int]:
+    linear = matrix[:, :3]
+    if (linear < 0).any() or matrix[:, 3].any():
+        return None
+
+    for channel in range(3):
+        if (linear[channel] >= linear).all():
+            return channel
+
+    return None
+
+
+def can_overflow(matrix: np.ndarray) -> bool:
+    # the largest value any channel can reach from an 8-bit input
+    return (matrix[:, :3].clip(0).sum(axis=1) * 255 + matrix[:, 3]).max() > 255
+
+
+def fold_saturation(matrix: np.ndarray, factor: float) -> Optional[np.ndarray]:
+    # with a known maximum channel V, scaling HSV saturation is the affine map
+    # c' = V + factor * (c - V), as long as the result stays inside the gamut;
+    # a matrix that can overflow is clipped before saturation sees it, which the fold would skip
+    channel = dominant_channel(matrix)
+    if channel is None or can_overflow(matrix):
+        return None
+
+    linear = matrix[:, :3]
+    if factor > 1:
+        columns = linear[channel] > 0
+        min_ratio = (linear[:, columns] / linear[channel, columns]).min() if columns.any() else 1
+        if factor * (1 - min_ratio) > 1:
+            return None
+
+    saturation_matrix = np.hstack((factor * np.eye(3), np.zeros((3, 1))))
+    saturation_matrix[:, channel] += 1 - factor
+
+    return fold_matrices(matrix, saturation_matrix)
+
+
+def apply_matrix(image: np.ndarray, matrix: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    if image.shape[2] == 4:
+        alpha_row = np.array([[0, 0, 0, 1, 0]])
+        matrix = np.vstack((np.insert(matrix, 3, 0, axis=1), alpha_row))
+
+    return cv2.transform(image, matrix.astype(np.float32), dst=out)
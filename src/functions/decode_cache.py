@@ -0,0 +1,153 @@
+import os
+import hashlib
+import threading
+import numpy as np
+from typing import Callable, Optional
+
+
+CACHE_DIR = '../cache/decoded'
+CACHE_LIMIT = 2 * 1024 ** 3
+HASH_CHUNK = 1024 * 1024
+
+cache_dir = CACHE_DIR
+cache_limit = CACHE_LIMIT
+cache_lock = threading.Lock()
+
+# (path, size, mtime) -> content digest, so reopening a file in this session skips hashing it again
+digests: dict[tuple[str, int, int], str] = {}
+
+
+def set_cache_dir(path: str) -> None:
+    global cache_dir
+    cache_dir = path
+
+
+def set_cache_limit(limit: int) -> None:
+    global cache_limit
+    cache_limit = max(0, limit)
+    evict()
+
+
+def file_digest(path: str) -> tuple[str, int]:
+    stat = os.stat(path)
+    identity = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+    if identity not in digests:
+        hasher = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as file:
+            while chunk := file.read(HASH_CHUNK):
+                hasher.update(chunk)
+        digests[identity] = hasher.hexdigest()
+
+    return digests[identity], stat.st_mtime_ns
+
+
+def cache_key(path: str, variant: str = 'full') -> str:
+    digest, mtime = file_digest(path)
+    return f'{digest}-{mtime}-{variant}'
+
+
+def cache_path(key: str) -> str:
+    return os.path.join(cache_dir, key + '.npy')
+
+
+def lookup(key: str) -> Optional[np.ndarray]:
+    path = cache_path(key)
+
+    try:
+        image = np.asarray(np.load(path, mmap_mode='r'))
+    except (OSError, ValueError):
+        return None
+
+    # the file's mtime doubles as its last use, which is what eviction sorts by
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+    return image
+
+
+def store(key: str, image: np.ndarray) -> None:
+    if image.nbytes > cache_limit:
+        return
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = cache_path(key)
+    partial = f'{path}.{os.getpid()}.{threading.get_ident()}.partial'
+
+    try:
+        with open(partial, 'wb') as file:
+            np.save(file, image)
+        os.replace(partial, path)
+    except OSError:
+        if os.path.exists(partial):
+            os.remove(partial)
+        return
+
+    evict()
+
+
+def cache_entries() -> list[tuple[float, int, str]]:
+    if not os.path.isdir(cache_dir):
+        return []
+
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith('.npy'):
+            continue
+
+        path = os.path.join(cache_dir, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    return entries
+
+
+def cache_size() -> int:
+    return sum(size for _, size, _ in cache_entries())
+
+
+def evict() -> None:
+    with cache_lock:
+        entries = sorted(cache_entries())
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, path in entries:
+            if total <= cache_limit:
+                break
+
+            # an entry still mapped by an open image stays readable on POSIX; on Windows removal may fail and is retried later
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                continue
+
+
+def clear_cache() -> None:
+    with cache_lock:
+        for _, _, path in cache_entries():
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+
+    digests.clear()
+
+
+def cached_decode(path: str, decode: Callable[[str], np.ndarray], variant: str = 'full') -> np.ndarray:
+    try:
+        key = cache_key(path, variant)
+    except OSError:
+        return decode(path)
+
+    image = lookup(key)
+    if image is None:
+        image = decode(path)
+        store(key, image)
+
+    return image
@@ -0,0 +1,56 @@
+import base64
+import numpy as np
+import cv2
+from io import BytesIO
+from collections import OrderedDict
+from typing import Hashable
+from PIL import Image
+
+
+PREVIEW_CACHE_SIZE = 32
+JPEG_QUALITY = 90
+WEBP_QUALITY = 90
+
+preview_cache: OrderedDict[Hashable, str] = OrderedDict()
+
+
+def fit_to_canvas(image: np.ndarray, max_width: int, max_height: int) -> np.ndarray:
+    height, width = image.shape[:2]
+    scale = min(1.0, max_width / width, max_height / height)
+
+    if scale == 1.0:
+        return image
+
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+
+def encode_preview(image: np.ndarray, max_width: int, max_height: int) -> str:
+    image = fit_to_canvas(image, max_width, max_height)
+    buff = BytesIO()
+
+    # opaque previews go out as JPEG, only real transparency pays for a lossless-alpha format
+    if image.shape[2] == 4 and image[:, :, 3].min() < 255:
+        Image.fromarray(image).save(buff, format='WEBP', quality=WEBP_QUALITY, method=0)
+    else:
+        Image.fromarray(image[:, :, :3]).save(buff, format='JPEG', quality=JPEG_QUALITY)
+
+    return base64.b64encode(buff.getvalue()).decode("utf-8")
+
+
+def cached_preview(key: Hashable, image: np.ndarray, max_width: int, max_height: int) -> str:
+    if key in preview_cache:
+        preview_cache.move_to_end(key)
+        return preview_cache[key]
+
+    encoded = encode_preview(image, max_width, max_height)
+    preview_cache[key] = encoded
+
+    if len(preview_cache) > PREVIEW_CACHE_SIZE:
+        preview_cache.popitem(last=False)
+
+    return encoded
+
+
+def clear_previews() -> None:
+    preview_cache.clear()
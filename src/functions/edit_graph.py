@@ -0,0 +1,153 @@
+import numpy as np
+from itertools import count
+from collections import OrderedDict
+from threading import Event
+from typing import Callable, Optional
+from functions.image_operations import apply_operation
+from functions.preset_compiler import Step, check_cancelled
+from functions.profiling import span
+
+
+HISTORY_BUDGET = 512 * 1024 ** 2
+
+node_ids = count(1)
+
+
+class EditNode:
+    name: str
+    values: Optional[list]
+    uid: int
+
+    def __init__(self, name: str, values: Optional[list] = None) -> None:
+        self.name = name
+        self.values = values
+        self.uid = next(node_ids)
+
+
+class EditGraph:
+    source: np.ndarray
+    scale: float
+    nodes: list[EditNode]
+    cursor: int
+    checkpoints: OrderedDict[int, np.ndarray]
+    checkpoint_interval: int
+    head: int
+    budget: int
+
+    def __init__(self, source: np.ndarray, scale: float = 1.0, checkpoint_interval: int = 4, budget: int = HISTORY_BUDGET) -> None:
+        self.source = source
+        self.scale = scale
+        self.nodes = []
+        self.cursor = 0
+        self.checkpoints = OrderedDict({0: source})
+        self.checkpoint_interval = checkpoint_interval
+        self.head = 0
+        self.budget = budget
+
+    def append(self, name: str, values: Optional[list] = None) -> None:
+        self.nodes = self.nodes[:self.cursor]
+        self.invalidate(self.cursor + 1)
+        self.nodes.append(EditNode(name, values))
+        self.cursor = len(self.nodes)
+
+    def set_values(self, index: int, values: Optional[list]) -> None:
+        self.nodes[index - 1].values = values
+        self.nodes[index - 1].uid = next(node_ids)
+        self.invalidate(index)
+
+    def invalidate(self, index: int) -> None:
+        for checkpoint in [checkpoint for checkpoint in self.checkpoints if checkpoint >= index]:
+            del self.checkpoints[checkpoint]
+
+    def undo(self) -> bool:
+        if self.cursor == 0:
+            return False
+
+        self.cursor -= 1
+        return True
+
+    def redo(self) -> bool:
+        if self.cursor == len(self.nodes):
+            return False
+
+        self.cursor += 1
+        return True
+
+    def steps(self, index: Optional[int] = None) -> list[Step]:
+        index = self.cursor if index is None else index
+        return [(node.name, node.values) for node in self.nodes[:index]]
+
+    def key(self, index: Optional[int] = None) -> tuple[int, ...]:
+        # identifies the rendered pixels of a node, changes whenever the node or anything before it does
+        index = self.cursor if index is None else index
+        return (id(self.source),) + tuple(node.uid for node in self.nodes[:index])
+
+    def is_checkpoint(self, index: int) -> bool:
+        return index % self.checkpoint_interval == 0
+
+    def checkpoint_bytes(self) -> int:
+        return sum(image.nbytes for image in self.checkpoints.values())
+
+    def store(self, index: int, image: np.ndarray) -> None:
+        self.checkpoints[index] = image
+        self.checkpoints.move_to_end(index)
+        self.evict()
+
+    def evict(self) -> None:
+        # the source is never evicted, everything else can be replayed from it
+        size = self.checkpoint_bytes()
+        for checkpoint in list(self.checkpoints):
+            if size <= self.budget:
+                break
+            if checkpoint in (0, self.head):
+                continue
+
+            size -= self.checkpoints.pop(checkpoint).nbytes
+
+    def render(self, index: Optional[int] = None, cancel_event: Optional[Event] = None) -> np.ndarray:
+        index = self.cursor if index is None else index
+        start = max(checkpoint for checkpoint in self.checkpoints if checkpoint <= index)
+        self.checkpoints.move_to_end(start)
+        image = self.checkpoints[start]
+
+        for position in range(start + 1, index + 1):
+            check_cancelled(cancel_event)
+            node = self.nodes[position - 1]
+            with span(node.name, 'replay', index=position):
+                image = apply_operation(image, node.name, node.values, self.scale, cancel_event)
+
+            if self.is_checkpoint(position):
+                self.store(position, image)
+
+        self.set_head(index, image)
+
+        return image
+
+    def set_head(self, index: int, image: np.ndarray) -> None:
+        # the last rendered node stays cached as well, so redisplaying it is free
+        if self.head != index and not self.is_checkpoint(self.head):
+            self.checkpoints.pop(self.head, None)
+        self.head = index
+        self.store(index, image)
+
+    def commit(self, name: str, values: Optional[list], image: np.ndarray) -> None:
+        self.append(name, values)
+        self.set_head(self.cursor, image)
+
+    def commit_steps(self, steps: list[Step], image: np.ndarray) -> None:
+        # every step becomes its own node for undo, only the final image is stored; intermediate nodes render on demand
+        for name, values in steps:
+            self.append(name, values)
+        self.set_head(self.cursor, image)
+
+    def replay(self, source: np.ndarray, on_progress: Optional[Callable[[float], None]] = None, cancel_event: Optional[Event] = None) -> np.ndarray:
+        steps = self.steps()
+        image = source
+
+        for index, (name, values) in enumerate(steps):
+            with span(name, 'replay', index=index + 1, full_resolution=True):
+                image = apply_operation(image, name, values, cancel_event=cancel_event)
+            if on_progress is not None:
+                on_progress((index + 1) / len(steps))
+
+        return image
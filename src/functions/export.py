@@ -0,0 +1,177 @@
+import os
+import numpy as np
+import cv2
+from PIL import Image
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+from functions.profiling import span
+
+
+EXPORT_FORMATS = {'png': 'PNG', 'jpg': 'JPEG', 'jpeg': 'JPEG', 'webp': 'WEBP'}
+OPAQUE_FORMATS = ('JPEG',)
+
+export_workers = os.cpu_count() or 1
+executor = None
+
+
+class ExportTarget:
+    suffix: str
+    extension: str
+    max_size: Optional[int]
+    quality: int
+    compress_level: int
+    progressive: bool
+    optimize: bool
+
+    def __init__(
+            self,
+            extension: str,
+            suffix: str = '',
+            max_size: Optional[int] = None,
+            quality: int = 95,
+            compress_level: int = 6,
+            progressive: bool = False,
+            optimize: bool = False
+        ) -> None:
+
+        extension = extension.lower().lstrip('.')
+        if extension not in EXPORT_FORMATS:
+            raise ValueError(f'unsupported export format: {extension}')
+
+        self.suffix = suffix
+        self.extension = extension
+        self.max_size = max_size
+        self.quality = quality
+        self.compress_level = compress_level
+        self.progressive = progressive
+        self.optimize = optimize
+
+    @property
+    def format(self) -> str:
+        return EXPORT_FORMATS[self.extension]
+
+    def size_for(self, width: int, height: int) -> tuple[int, int]:
+        # max_size caps the long edge, smaller images are never upscaled
+        if self.max_size is None or max(width, height) <= self.max_size:
+            return width, height
+
+        scale = self.max_size / max(width, height)
+        return max(1, round(width * scale)), max(1, round(height * scale))
+
+    def path_for(self, base_path: str) -> str:
+        return f'{os.path.splitext(base_path)[0]}{self.suffix}.{self.extension}'
+
+    def options(self) -> dict:
+        match self.format:
+            case 'JPEG':
+                return {'quality': self.quality, 'progressive': self.progressive, 'optimize': self.optimize}
+            case 'PNG':
+                return {'compress_level': self.compress_level, 'optimize': self.optimize}
+            case 'WEBP':
+                return {'quality': self.quality, 'method': 6 if self.optimize else 4}
+
+
+class ExportResult:
+    path: str
+    width: int
+    height: int
+    seconds: float
+    bytes: int
+    error: Optional[str]
+
+    def __init__(self, path: str, width: int, height: int, seconds: float, size: int, error: Optional[str] = None) -> None:
+        self.path = path
+        self.width = width
+        self.height = height
+        self.seconds = seconds
+        self.bytes = size
+        self.error = error
+
+    def describe(self) -> str:
+        if self.error is not None:
+            return f'{os.path.basename(self.path)} failed: {self.error}'
+
+        return f'{os.path.basename(self.path)} {self.width}x{self.height} {self.bytes / 1024:.0f} KB in {self.seconds * 1000:.0f} ms'
+
+
+def web_targets(quality: int = 85) -> list[ExportTarget]:
+    return [
+        ExportTarget('jpg', '-web', 2048, quality=quality, progressive=True, optimize=True),
+        ExportTarget('jpg', '-thumb', 320, quality=80, optimize=True)
+    ]
+
+
+def set_export_workers(workers: int) -> None:
+    global export_workers, executor
+
+    if executor is not None:
+        executor.shutdown()
+        executor = None
+
+    export_workers = max(1, workers)
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global executor
+
+    if executor is None:
+        executor = ThreadPoolExecutor(max_workers=export_workers, thread_name_prefix='export')
+
+    return executor
+
+
+def build_pyramid(image: np.ndarray, sizes: list[tuple[int, int]]) -> dict[tuple[int, int], np.ndarray]:
+    height, width = image.shape[:2]
+    levels = {(width, height): image}
+
+    # every level is reduced from the smallest one already built that still covers it, largest first
+    for size in sorted(set(sizes), key=lambda size: size[0] * size[1], reverse=True):
+        if size in levels:
+            continue
+
+        source_size = min((level for level in levels if level[0] >= size[0] and level[1] >= size[1]), key=lambda level: level[0] * level[1])
+        levels[size] = cv2.resize(levels[source_size], size, interpolation=cv2.INTER_AREA)
+
+    return levels
+
+
+def encode_target(image: np.ndarray, path: str, target: ExportTarget) -> ExportResult:
+    height, width = image.shape[:2]
+    partial = path + '.partial'
+
+    with span(os.path.basename(path), 'export', format=target.format) as encode_span:
+        try:
+            image_pil = Image.fromarray(image)
+            if target.format in OPAQUE_FORMATS and image_pil.mode == 'RGBA':
+                image_pil = image_pil.convert('RGB')
+
+            # encode next to the target and rename, so a failed export never leaves half a file behind
+            image_pil.save(partial, format=target.format, **target.options())
+            os.replace(partial, path)
+            error = None
+        except Exception as exception:
+            if os.path.exists(partial):
+                os.remove(partial)
+            error = f'{type(exception).__name__}: {exception}'
+
+    size = os.path.getsize(path) if error is None else 0
+    return ExportResult(path, width, height, encode_span.seconds, size, error)
+
+
+def export_image(image: np.ndarray, base_path: str, targets: list[ExportTarget]) -> list[Future]:
+    height, width = image.shape[:2]
+    sizes = [target.size_for(width, height) for target in targets]
+    pyramid = build_pyramid(image, sizes)
+
+    return [
+        get_executor().submit(encode_target, pyramid[size], target.path_for(base_path), target)
+        for target, size in zip(targets, sizes)
+    ]
+
+
+def export_now(image: np.ndarray, base_path: str, targets: list[ExportTarget]) -> list[ExportResult]:
+    height, width = image.shape[:2]
+    sizes = [target.size_for(width, height) for target in targets]
+    pyramid = build_pyramid(image, sizes)
+
+    return [encode_target(pyramid[size], target.path_for(base_path), target) for target, size in zip(targets, sizes)]
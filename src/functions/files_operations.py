@@ -1,43 +1,153 @@
-import shutil
 import os
-from io import BytesIO
+import threading
 import flet as ft
 import numpy as np
-import base64
-from PIL import Image
+from concurrent.futures import Future
+from typing import Callable, Optional
+from functions.edit_graph import EditGraph
+from functions.preset_compiler import Step
+from functions.image_operations import image_processing_functions, apply_operation, apply_steps, seed_values
+from functions.worker import BackgroundWorker
+from functions.live_preview import LivePreview
+from functions.display_encoder import clear_previews
+from functions.profiling import Span, span, report
+from functions.image_loader import SourceImage, open_source
+from functions.export import ExportTarget, export_image, web_targets
+from functions.viewport import Viewport
+from functions.batch_session import BatchSession, UpdateCallback
+from functions.recipes import save_recipe, load_recipe, replay_recipe
 
-history = []
-current_index = -1
+CANVAS_WIDTH = 1400
+CANVAS_HEIGHT = 780
 
-def add_to_history(image: ft.Ref[np.ndarray]) -> None:
-    global history, current_index
+edit_graph = None
+source_image: Optional[SourceImage] = None
 
-    current_index = current_index + 1
-    clear_history_forward()
-    history.append(image.value)
+worker = BackgroundWorker()
+# keeps the canvas pyramid at full resolution on its own thread, so the next edit does not wait for it
+pyramid_worker = BackgroundWorker()
+live_preview = LivePreview()
+viewport = Viewport(CANVAS_WIDTH, CANVAS_HEIGHT)
+batch_session: Optional[BatchSession] = None
+display_lock = threading.Lock()
 
 
-def read_from_history() -> np.ndarray:
-    global history, current_index
-    return history[current_index]
+def set_busy_indicator(on_busy: Callable[[bool], None]) -> None:
+    worker.on_busy = on_busy
 
 
-def clear_history_forward() -> None:
-    global history, current_index
-    history = history[:current_index]
+def add_image_operation(name: str, image_arr: ft.Ref[np.ndarray], image_flet: ft.Image, values: Optional[list] = None) -> None:
+    global edit_graph
 
+    if edit_graph is None or name not in image_processing_functions:
+        return
 
-def create_copy(file_path: str) -> str:
-    file_name = os.path.basename(file_path)
-    destination_dir = '../tmp/'
+    live_preview.cancel()
+    graph = edit_graph
+    values = seed_values(name, values)
+    worker.submit(name, lambda cancel_event: apply_job(graph, name, values, image_arr, image_flet, cancel_event))
 
-    if not os.path.exists(destination_dir):
-        os.makedirs(destination_dir)
 
-    destination = os.path.join(destination_dir, file_name)
-    shutil.copyfile(file_path, destination)
+def apply_job(graph: EditGraph, name: str, values: Optional[list], image_arr: ft.Ref[np.ndarray], image_flet: ft.Image, cancel_event: threading.Event) -> None:
+    with span(name, 'job', values=values):
+        with span('history', 'history') as base_span:
+            base = graph.render(cancel_event=cancel_event)
 
-    return destination
+        with span(name, 'filter') as filter_span:
+            image = apply_operation(base, name, values, graph.scale, cancel_event)
+
+        # history and display change together, and only if the photo was not replaced in the meantime
+        with display_lock:
+            if graph is not edit_graph:
+                return
+
+            with span('commit', 'history') as commit_span:
+                graph.commit(name, values, image)
+            encode_span, transfer_span = show_current(image_arr, image_flet)
+            update_full_resolution(graph, image_flet)
+
+    base_span.seconds += commit_span.seconds
+    report(filter_span, base_span, encode_span, transfer_span)
+
+
+def cancel_command() -> None:
+    worker.cancel()
+
+
+def preview_operation(name: str, photo_flet: ft.Image, values: list) -> None:
+    if edit_graph is None:
+        return
+
+    live_preview.request(name, values, lambda encoded, generation: show_preview(photo_flet, encoded, generation))
+
+
+def show_preview(photo_flet: ft.Image, encoded: str, generation: int) -> None:
+    with display_lock:
+        if live_preview.is_current(generation):
+            photo_flet.src_base64 = encoded
+            photo_flet.update()
+
+
+def end_preview(photo_arr: ft.Ref[np.ndarray], photo_flet: ft.Image) -> None:
+    if live_preview.cancel():
+        worker.submit(None, lambda _: refresh_display(photo_arr, photo_flet))
+
+
+def refresh_display(photo_arr: ft.Ref[np.ndarray], photo_flet: ft.Image) -> None:
+    with display_lock:
+        if edit_graph is not None:
+            show_current(photo_arr, photo_flet)
+
+
+def render_full_resolution(on_progress: Callable[[float], None], cancel_event: Optional[threading.Event] = None) -> np.ndarray:
+    global edit_graph, source_image
+
+    if edit_graph.scale == 1.0:
+        return edit_graph.render(cancel_event=cancel_event)
+
+    # the canvas pyramid may already hold this edit at full resolution
+    key, image = viewport.full_resolution()
+    if key == edit_graph.key():
+        return image
+
+    return edit_graph.replay(source_image.load(), on_progress, cancel_event)
+
+
+def update_full_resolution(graph: EditGraph, photo_flet: ft.Image) -> None:
+    # at scale 1 the working image already is the full resolution
+    if graph.scale < 1.0:
+        pyramid_worker.submit('pyramid', lambda cancel_event: full_resolution_job(graph, photo_flet, cancel_event))
+
+
+def full_resolution_job(graph: EditGraph, photo_flet: ft.Image, cancel_event: threading.Event) -> None:
+    with display_lock:
+        if graph is not edit_graph:
+            return
+
+        key = graph.key()
+        steps = graph.steps()
+        source = source_image
+
+    base_key, base = viewport.full_resolution()
+    if base_key == key:
+        return
+
+    # an edit that extends the one in the pyramid only replays the steps added since,
+    # anything else (undo, a new photo) starts again from the decoded source
+    with span('full resolution', 'job', steps=len(steps)):
+        if base is not None and key[:len(base_key)] == base_key:
+            image = apply_steps(base, steps[len(base_key) - 1:], cancel_event=cancel_event)
+        else:
+            image = apply_steps(source.load(), steps, cancel_event=cancel_event)
+
+        with display_lock:
+            if graph is not edit_graph:
+                return
+
+            with span('pyramid', 'display'):
+                viewport.set_full_resolution(key, image)
+            if key == graph.key() and viewport.needs_full_resolution():
+                show_view(photo_flet)
 
 
 def pick_files_open(
@@ -47,54 +157,206 @@ def pick_files_open(
         photo_arr: ft.Ref[np.ndarray],
         width_input: ft.TextField,
         height_input: ft.TextField,
+        on_batch: Callable[[Optional[BatchSession]], None],
         e: ft.FilePickerResultEvent
     ) -> None:
 
-    global history, current_index
+    global edit_graph, source_image, batch_session
 
     if e.files:
-        history = []
-        photo_flet.src_base64 = ""
+        worker.cancel()
+        pyramid_worker.cancel()
+
+        # picking several files starts a batch session, the first one is opened to build the edit on
+        if batch_session is None or not batch_session.busy:
+            paths = [file.path.replace("\\", "/") for file in e.files]
+            batch_session = BatchSession(paths) if len(paths) > 1 else None
+            on_batch(batch_session)
 
         file_path = e.files[0].path.replace("\\", "/")
         old_path.value = file_path
         old_path.update()
 
-        new_file_path = create_copy(file_path)
-        new_path.value = new_file_path
-        photo_flet.src = new_file_path
-        photo_arr.value = np.asarray(open_image(new_file_path))
+        new_path.value = file_path
+        photo_flet.src = file_path
+        proxy, proxy_scale, source = open_source(file_path, CANVAS_WIDTH, CANVAS_HEIGHT)
+        if proxy_scale < 1.0:
+            source.preload()
+
+        with display_lock:
+            photo_flet.src_base64 = ""
+            source_image = source
+            photo_arr.value = proxy
+            edit_graph = EditGraph(proxy, proxy_scale)
+            viewport.clear()
+            viewport.set_image(edit_graph.key(), proxy, proxy_scale)
+            viewport.reset()
+            live_preview.set_base(*viewport.visible(), proxy_scale)
+            clear_previews()
+            set_display_size(photo_flet, *viewport.display_size())
+
+        width_input.value = source.width
+        height_input.value = source.height
 
-        height, width, _ = photo_arr.value.shape
-        width_input.value = width
-        height_input.value = height
+        photo_flet.update()
+        update_full_resolution(edit_graph, photo_flet)
 
-        add_to_history(photo_arr)
-        current_index = 0
 
-        photo_flet.update()
+def apply_batch(on_update: UpdateCallback, on_finish: Callable[[], None]) -> bool:
+    with display_lock:
+        if batch_session is None or edit_graph is None:
+            return False
+
+        steps = edit_graph.steps()
+
+    # the edit built on the opened photo is replayed at full resolution on every file of the session
+    return bool(steps) and batch_session.start(steps, on_update, on_finish)
+
+
+def cancel_batch() -> None:
+    if batch_session is not None:
+        batch_session.cancel()
+
+
+def pick_recipe_save(on_status: Callable[[str], None], e: ft.FilePickerResultEvent) -> None:
+    if not e.path or edit_graph is None:
+        return
+
+    path = e.path if e.path.endswith('.json') else e.path + '.json'
+    with display_lock:
+        steps = edit_graph.steps()
+
+    try:
+        save_recipe(path, steps)
+    except OSError as error:
+        on_status(f'could not save recipe: {error}')
+        return
+
+    on_status(f'saved recipe of {len(steps)} steps to {os.path.basename(path)}')
+
+
+def pick_recipe_open(photo_arr: ft.Ref[np.ndarray], photo_flet: ft.Image, on_status: Callable[[str], None], e: ft.FilePickerResultEvent) -> None:
+    if not e.files or edit_graph is None:
+        return
+
+    try:
+        steps = load_recipe(e.files[0].path)
+    except (OSError, ValueError) as error:
+        on_status(f'could not load recipe: {error}')
+        return
+
+    steps = [(name, seed_values(name, values)) for name, values in steps]
+
+    live_preview.cancel()
+    graph = edit_graph
+    worker.submit(None, lambda cancel_event: replay_job(graph, steps, photo_arr, photo_flet, on_status, cancel_event))
+
 
+def replay_job(
+        graph: EditGraph,
+        steps: list[Step],
+        photo_arr: ft.Ref[np.ndarray],
+        photo_flet: ft.Image,
+        on_status: Callable[[str], None],
+        cancel_event: threading.Event
+    ) -> None:
+
+    with span('recipe', 'job', steps=len(steps)) as job_span:
+        with span('history', 'history') as base_span:
+            base = graph.render(cancel_event=cancel_event)
+
+        # the steps run back to back, the history and the canvas only see the final image
+        with span('replay', 'filter') as replay_span:
+            image = replay_recipe(base, steps, graph.scale, cancel_event)
+
+        with display_lock:
+            if graph is not edit_graph:
+                return
+
+            graph.commit_steps(steps, image)
+            show_current(photo_arr, photo_flet)
+            update_full_resolution(graph, photo_flet)
+
+    on_status(f'replayed {len(steps)} steps in {job_span.milliseconds:.0f} ms')
+    report(replay_span, base_span)
+
+
+def pick_file_save(
+        photo_flet: ft.Image,
+        progress_bar: ft.ProgressBar,
+        web_copies: ft.Checkbox,
+        on_status: Callable[[str], None],
+        e: ft.FilePickerResultEvent
+    ) -> None:
 
-def pick_file_save(photo_flet: ft.Image, photo_arr: ft.Ref[np.ndarray], e: ft.FilePickerResultEvent) -> None:
     save_location = e.path
-    if save_location:
-        if '.' not in save_location:
+    if save_location and edit_graph is not None:
+        if '.' not in os.path.basename(save_location):
             original_extension = os.path.splitext(photo_flet.src)[1]
             save_location += original_extension
-            
-        save_image(photo_arr, save_location)
 
+        try:
+            targets = [ExportTarget(os.path.splitext(save_location)[1])]
+        except ValueError as error:
+            on_status(str(error))
+            return
+
+        if web_copies.value:
+            targets += web_targets()
 
-def save_image(photo_arr: ft.Ref[np.ndarray], output_path: str) -> None:
-    image_pil = Image.fromarray(photo_arr.value)
-    image_pil.save(output_path)
+        def show_progress(progress: float) -> None:
+            progress_bar.value = progress
+            progress_bar.update()
 
+        def save_job(cancel_event: threading.Event) -> None:
+            progress_bar.value = 0
+            progress_bar.visible = True
+            progress_bar.update()
+
+            try:
+                with span('save', 'job') as save_span:
+                    with span('render', 'history') as render_span:
+                        image = render_full_resolution(show_progress, cancel_event)
+
+                    with span('pyramid', 'export') as pyramid_span:
+                        futures = export_image(image, save_location, targets)
+            except BaseException:
+                progress_bar.visible = False
+                progress_bar.update()
+                raise
+
+            report(save_span, render_span, pyramid_span)
+            # encoding continues on the export threads, the worker is free for the next edit
+            track_export(futures, progress_bar, on_status)
+
+        worker.submit(None, save_job)
+
+
+def track_export(futures: list[Future], progress_bar: ft.ProgressBar, on_status: Callable[[str], None]) -> None:
+    results = []
+    lock = threading.Lock()
+
+    def finished(future: Future) -> None:
+        with lock:
+            results.append(future.result())
+            progress_bar.value = len(results) / len(futures)
+            progress_bar.visible = len(results) < len(futures)
+            progress_bar.update()
+
+            if len(results) == len(futures):
+                on_status('saved ' + '   '.join(result.describe() for result in results))
+
+    progress_bar.value = 0
+    progress_bar.update()
+
+    for future in futures:
+        future.add_done_callback(finished)
 
-def open_image(file_path: str) -> Image.Image:
-    return Image.open(file_path)
-     
 
 def delete_all_files(folder_path: str) -> None:
+    if not os.path.isdir(folder_path):
+        return
+
     files = os.listdir(folder_path)
     
     for file in files:
@@ -103,45 +365,79 @@ def delete_all_files(folder_path: str) -> None:
             os.remove(file_path)
 
 
-def update_image(photo_arr: ft.Ref[np.ndarray], photo_flet: ft.Image) -> None:
-    global history
+def show_current(photo_arr: ft.Ref[np.ndarray], photo_flet: ft.Image) -> tuple[Span, Span]:
+    global edit_graph
 
-    image_pil = Image.fromarray(photo_arr.value)
-    buff = BytesIO()
-    image_pil.save(buff, format='PNG')
-    src_base64 = base64.b64encode(buff.getvalue()).decode("utf-8")
+    key = edit_graph.key()
+    photo_arr.value = edit_graph.render()
+    viewport.set_image(key, photo_arr.value, edit_graph.scale)
 
-    photo_flet.src_base64 = src_base64
-    photo_flet.update()
+    return show_view(photo_flet)
 
 
-def undo_command(photo_arr: ft.Ref[np.ndarray], photo_flet: ft.Image):
-    global history, current_index
-
-    if current_index > 0:
-        current_index = current_index - 1
-        photo_arr.value = read_from_history()
-        
-        image_pil = Image.fromarray(photo_arr.value)
-        buff = BytesIO()
-        image_pil.save(buff, format='PNG')
-        src_base64 = base64.b64encode(buff.getvalue()).decode("utf-8")
-
-        photo_flet.src_base64 = src_base64
+def show_view(photo_flet: ft.Image) -> tuple[Span, Span]:
+    live_preview.set_base(*viewport.visible(), edit_graph.scale)
+
+    with span('encode', 'display') as encode_span:
+        photo_flet.src_base64, width, height = viewport.render()
+    set_display_size(photo_flet, width, height)
+
+    with span('transfer', 'display') as transfer_span:
         photo_flet.update()
 
+    return encode_span, transfer_span
+
+
+def set_display_size(photo_flet: ft.Image, width: int, height: int) -> None:
+    # lower resolution previews are stretched over the size of the visible region
+    photo_flet.width = width
+    photo_flet.height = height
+
+
+def zoom_view(photo_flet: ft.Image, factor: float, x: float, y: float) -> None:
+    viewport.zoom_at(factor, x, y)
+    worker.submit('view', lambda _: refresh_view(photo_flet))
+
+
+def pan_view(photo_flet: ft.Image, dx: float, dy: float) -> None:
+    viewport.pan(dx, dy)
+    worker.submit('view', lambda _: refresh_view(photo_flet))
+
+
+def reset_view(photo_flet: ft.Image) -> None:
+    viewport.reset()
+    worker.submit('view', lambda _: refresh_view(photo_flet))
+
+
+def refresh_view(photo_flet: ft.Image) -> None:
+    with display_lock:
+        if edit_graph is not None:
+            show_view(photo_flet)
+
+
+def undo_command(photo_arr: ft.Ref[np.ndarray], photo_flet: ft.Image):
+    worker.submit(None, lambda _: move_cursor(photo_arr, photo_flet, undo=True))
+
 
 def redo_command(photo_arr: ft.Ref[np.ndarray], photo_flet: ft.Image):
-    global history, current_index
-
-    if len(history) - 1 > current_index:
-        current_index = current_index + 1
-        photo_arr.value = read_from_history()
-        
-        image_pil = Image.fromarray(photo_arr.value)
-        buff = BytesIO()
-        image_pil.save(buff, format='PNG')
-        src_base64 = base64.b64encode(buff.getvalue()).decode("utf-8")
-
-        photo_flet.src_base64 = src_base64
-        photo_flet.update()
\ No newline at end of file
+    worker.submit(None, lambda _: move_cursor(photo_arr, photo_flet, undo=False))
+
+
+def move_cursor(photo_arr: ft.Ref[np.ndarray], photo_flet: ft.Image, undo: bool) -> None:
+    global edit_graph
+
+    with display_lock:
+        if edit_graph is None:
+            return
+
+        with span('undo' if undo else 'redo', 'job') as job_span:
+            moved = edit_graph.undo() if undo else edit_graph.redo()
+            if not moved:
+                return
+
+            with span('history', 'history') as history_span:
+                edit_graph.render()
+            encode_span, transfer_span = show_current(photo_arr, photo_flet)
+            update_full_resolution(edit_graph, photo_flet)
+
+    report(job_span, history_span, encode_span, transfer_span)
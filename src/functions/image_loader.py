@@ -0,0 +1,112 @@
+import threading
+import numpy as np
+import cv2
+from PIL import Image, ImageOps
+from typing import Optional
+from functions.decode_cache import cached_decode
+
+
+# orientations 5-8 store the picture rotated by 90 degrees
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+EXIF_ORIENTATION = 0x0112
+
+
+def oriented_size(image: Image.Image) -> tuple[int, int]:
+    width, height = image.size
+    if image.getexif().get(EXIF_ORIENTATION) in TRANSPOSED_ORIENTATIONS:
+        return height, width
+
+    return width, height
+
+
+def fit_scale(width: int, height: int, max_width: int, max_height: int) -> float:
+    return min(1.0, max_width / width, max_height / height)
+
+
+def has_alpha(image: Image.Image) -> bool:
+    return 'A' in image.getbands() or 'a' in image.getbands() or 'transparency' in image.info
+
+
+def to_working_array(image: Image.Image) -> np.ndarray:
+    # the editor works on 8-bit RGB, or RGBA whenever the source carries any transparency
+    if image.mode in ('I;16', 'I;16L', 'I;16B', 'I', 'F'):
+        values = np.asarray(image, dtype=np.float32)
+        gray = np.clip(values / 257 + 0.5, 0, 255).astype(np.uint8)
+        return np.ascontiguousarray(np.repeat(gray[:, :, np.newaxis], 3, axis=2))
+
+    mode = 'RGBA' if has_alpha(image) else 'RGB'
+
+    if image.mode != mode:
+        image = image.convert(mode)
+
+    return np.array(image)
+
+
+def load_full(path: str) -> np.ndarray:
+    with Image.open(path) as image:
+        return to_working_array(ImageOps.exif_transpose(image))
+
+
+def decode_proxy(path: str, proxy_size: tuple[int, int]) -> np.ndarray:
+    with Image.open(path) as image:
+        width, height = oriented_size(image)
+
+        # JPEG shrink-on-load decodes at 1/2, 1/4 or 1/8 scale, never below the requested size
+        if proxy_size != (width, height) and image.format == 'JPEG':
+            stored_size = proxy_size if (width, height) == image.size else proxy_size[::-1]
+            image.draft(image.mode, stored_size)
+
+        proxy = to_working_array(ImageOps.exif_transpose(image))
+
+    if (proxy.shape[1], proxy.shape[0]) != proxy_size:
+        proxy = cv2.resize(proxy, proxy_size, interpolation=cv2.INTER_AREA)
+
+    return proxy
+
+
+def load_proxy(path: str, max_width: int, max_height: int) -> tuple[np.ndarray, float, tuple[int, int]]:
+    with Image.open(path) as image:
+        width, height = oriented_size(image)
+
+    scale = fit_scale(width, height, max_width, max_height)
+    proxy_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+
+    if scale == 1.0:
+        proxy = cached_decode(path, load_full)
+    else:
+        proxy = cached_decode(path, lambda path: decode_proxy(path, proxy_size), f'proxy-{proxy_size[0]}x{proxy_size[1]}')
+
+    return proxy, scale, (width, height)
+
+
+class SourceImage:
+    path: str
+    width: int
+    height: int
+    lock: threading.Lock
+    image: Optional[np.ndarray]
+
+    def __init__(self, path: str, width: int, height: int, image: Optional[np.ndarray] = None) -> None:
+        self.path = path
+        self.width = width
+        self.height = height
+        self.lock = threading.Lock()
+        self.image = image
+
+    def load(self) -> np.ndarray:
+        # the full resolution is only decoded once something needs it, e.g. saving
+        with self.lock:
+            if self.image is None:
+                self.image = cached_decode(self.path, load_full)
+
+            return self.image
+
+    def preload(self) -> None:
+        threading.Thread(target=self.load, name='preload', daemon=True).start()
+
+
+def open_source(path: str, max_width: int, max_height: int) -> tuple[np.ndarray, float, SourceImage]:
+    proxy, scale, (width, height) = load_proxy(path, max_width, max_height)
+    source = SourceImage(path, width, height, proxy if scale == 1.0 else None)
+
+    return proxy, scale, source
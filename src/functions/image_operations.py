@@ -1,18 +1,21 @@
-import flet as ft
 import numpy as np
 import cv2
 import math
 from PIL import Image, ImageFilter
-from functions.files_operations import update_image, add_to_history
-from typing import Callable, Optional
-
-
-def rotate(image_arr: ft.Ref[np.ndarray], values: Optional[list]) -> None:
-    if image_arr.value is None:
-        return
-    
+from functions.preset_compiler import Step, run_preset
+from functions.tone_engine import PIXEL_OPERATIONS, compile_tone, apply_tone
+from functions.tiling import TileRegion, run_tiled, gaussian_halo
+from functions.alpha import split_alpha, merge_alpha, apply_color, apply_premultiplied
+from functions.buffer_pool import frame_pool
+from functions.noise_engine import add_noise, new_seed
+from collections import OrderedDict
+from threading import Event, Lock
+from typing import Callable, Hashable, Optional
+
+
+def rotate(image: np.ndarray, values: Optional[list]) -> np.ndarray:
     angle = 90
-    height, width = image_arr.value.shape[:2]
+    height, width = image.shape[:2]
     center = (width // 2, height // 2)
 
     abs_cos, abs_sin = abs(np.cos(np.radians(angle))), abs(np.sin(np.radians(angle)))
@@ -23,177 +26,196 @@ def rotate(image_arr: ft.Ref[np.ndarray], values: Optional[list]) -> None:
     rotation_matrix[0, 2] += bound_w / 2 - center[0]
     rotation_matrix[1, 2] += bound_h / 2 - center[1]
 
-    image_arr.value = cv2.warpAffine(image_arr.value, rotation_matrix, (bound_w, bound_h), flags=cv2.INTER_NEAREST)
+    return cv2.warpAffine(image, rotation_matrix, (bound_w, bound_h), flags=cv2.INTER_NEAREST)
 
 
-def flip(image_arr: ft.Ref[np.ndarray], values: list[float]) -> None:
-    if image_arr.value is None:
-        return
+def flip(image: np.ndarray, values: list[float]) -> np.ndarray:
+    if values is None:
+        return image
     
-    flipped_image = cv2.flip(image_arr.value, int(values[0]))
-    image_arr.value = flipped_image
+    return cv2.flip(image, int(values[0]))
 
 
-def resize(image_arr: ft.Ref[np.ndarray], values: list[float]) -> None:
-    if image_arr.value is None or values is None:
-        return
+def resize(image: np.ndarray, values: list[float]) -> np.ndarray:
+    if values is None:
+        return image
     
     new_width = int(values[0])
     new_height = int(values[1])
     
-    image_arr.value = cv2.resize(image_arr.value, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    return cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
 
 
-def blur(image_arr: ft.Ref[np.ndarray], blur_factor: list[float]) -> None:
-    if image_arr.value is None or blur_factor is None:
-        return
+def blur(image: np.ndarray, blur_factor: list[float]) -> np.ndarray:
+    if blur_factor is None:
+        return image
     
-    pil_image = Image.fromarray(image_arr.value)
-    blurred_image = pil_image.filter(ImageFilter.GaussianBlur(blur_factor[0]))
-    image_arr.value = np.array(blurred_image)
+    radius = blur_factor[0]
+    premultiplied = len(blur_factor) > 1 and bool(blur_factor[1])
 
+    if premultiplied:
+        return run_tiled(image, lambda tile, _: apply_premultiplied(tile, lambda color: blur_tile(color, radius)), gaussian_halo(radius))
 
-def sharpen(image_arr: ft.Ref[np.ndarray], sharpen_factor: list[float]) -> None:
-    if image_arr.value is None or sharpen_factor is None:
-        return
-    
-    sharpened_channels = []
-    for channel in cv2.split(image_arr.value):
-        blurred_channel = cv2.GaussianBlur(channel, (0, 0), sharpen_factor[0])
-        unsharp_mask = cv2.addWeighted(channel, 1.0 + sharpen_factor[0], blurred_channel, -sharpen_factor[0], 0)
-        sharpened_channels.append(unsharp_mask)
-    
-    sharpened_image = cv2.merge(sharpened_channels)
-    
-    image_arr.value = sharpened_image
+    return run_tiled(image, lambda tile, _: blur_tile(tile, radius), gaussian_halo(radius))
 
 
-def noise(image_arr: ft.Ref[np.ndarray], noise_intensity: list[float]) -> None:
-    if image_arr.value is None:
-        return
-    
-    noise = np.random.normal(scale=noise_intensity[0], size=image_arr.value.shape).astype(np.uint8)
-    noisy_image = cv2.add(image_arr.value, noise)
+def blur_tile(image: np.ndarray, radius: float) -> np.ndarray:
+    pil_image = Image.fromarray(image)
+    blurred_image = pil_image.filter(ImageFilter.GaussianBlur(radius))
+    return np.array(blurred_image)
+
+
+def sharpen(image: np.ndarray, sharpen_factor: list[float], out: Optional[np.ndarray] = None) -> np.ndarray:
+    if sharpen_factor is None:
+        return image
     
-    if image_arr.value.shape[2] == 3:
-        image_arr.value = noisy_image
+    amount = sharpen_factor[0]
+    sigma = sharpen_factor[1] if len(sharpen_factor) > 1 else amount
 
-    elif image_arr.value.shape[2] == 4:
-        alpha_channel = image_arr.value[:, :, 3]
-        transparent_pixels = np.where(alpha_channel == 0, True, False)
-        noisy_image[transparent_pixels] = image_arr.value[transparent_pixels]
-        
-        image_arr.value = noisy_image
+    return run_tiled(
+        image,
+        lambda tile, _, tile_out: apply_color(tile, lambda color, color_out: sharpen_tile(color, amount, sigma, color_out), tile_out),
+        gaussian_halo(sigma),
+        out=out,
+        buffered=True
+    )
 
 
-def color_adjustments(image_arr: ft.Ref[np.ndarray], colors: list[float]) -> None:
-    if image_arr.value is None or image_arr.value.shape[2] < 3 or colors is None:
-        return
-    
-    image = image_arr.value.astype(np.float32)
-    image[:, :, 0] *= colors[0]
-    image[:, :, 1] *= colors[1]
-    image[:, :, 2] *= colors[2]
+def sharpen_tile(image: np.ndarray, amount: float, sigma: float, out: Optional[np.ndarray] = None) -> np.ndarray:
+    blurred_image = cv2.GaussianBlur(image, (0, 0), sigma)
+    return cv2.addWeighted(image, 1.0 + amount, blurred_image, -amount, 0, dst=out)
 
-    image = np.clip(image, 0, 255).astype(np.uint8)
-    image_arr.value = image
 
+def noise(image: np.ndarray, noise_intensity: list[float], out: Optional[np.ndarray] = None) -> np.ndarray:
+    if noise_intensity is None:
+        return image
 
-def hue(image_arr: ft.Ref[np.ndarray], hue_factor: list[float]) -> None:
-    if image_arr.value is None or image_arr.value.shape[2] < 3 or hue_factor is None:
-        return
+    sigma = noise_intensity[0]
+    seed = noise_intensity[1] if len(noise_intensity) > 1 else None
+    texture = len(noise_intensity) > 2 and bool(noise_intensity[2])
+
+    noisy_image = apply_color(image, lambda color, color_out: add_noise(color, sigma, seed, texture, color_out), out)
+
+    if image.shape[2] == 4:
+        transparent_pixels = (image[:, :, 3] == 0)[:, :, np.newaxis]
+        np.copyto(noisy_image, image, where=transparent_pixels)
+
+    return noisy_image
+
+
+def color_adjustments(image: np.ndarray, colors: list[float], out: Optional[np.ndarray] = None) -> np.ndarray:
+    if image.shape[2] < 3 or colors is None:
+        return image
     
-    if image_arr.value.shape[2] == 3:
-        bgr_image = image_arr.value
-        hsv_image = cv2.cvtColor(bgr_image, cv2.COLOR_RGB2HSV)
+    return apply_tone(image, compile_tone([('color adjustments', colors)]), out)
 
-        hsv_image[:, :, 0] = (hsv_image[:, :, 0] + hue_factor[0]) % 180
-        adjusted_image = cv2.cvtColor(hsv_image, cv2.COLOR_HSV2RGB)
 
-        image_arr.value = adjusted_image
+def hue(image: np.ndarray, hue_factor: list[float], out: Optional[np.ndarray] = None) -> np.ndarray:
+    if image.shape[2] < 3 or hue_factor is None:
+        return image
+    
+    # a third of the colour wheel moves every channel onto the next one, which is a plain shuffle
+    # instead of an HSV round trip; other shifts need the real conversion
+    thirds = hue_factor[0] % 180 / 60
+    if thirds in (0, 1, 2):
+        return rotate_channels(image, int(thirds), out)
 
-    elif image_arr.value.shape[2] == 4:
-        bgr_image = image_arr.value[:, :, :3]
-        alpha_channel = image_arr.value[:, :, 3]
+    return apply_tone(image, compile_tone([('hue', hue_factor)]), out)
 
-        hsv_image = cv2.cvtColor(bgr_image, cv2.COLOR_BGR2HSV)
-        hsv_image[:, :, 0] = (hsv_image[:, :, 0] + hue_factor[0]) % 180
-        bgr_adjusted_image = cv2.cvtColor(hsv_image, cv2.COLOR_HSV2BGR)
 
-        adjusted_image = np.dstack((bgr_adjusted_image, alpha_channel))
+def rotate_channels(image: np.ndarray, thirds: int, out: Optional[np.ndarray] = None) -> np.ndarray:
+    if out is None:
+        out = np.empty_like(image)
 
-        image_arr.value = adjusted_image
+    # hue() reads 3-channel images as RGB and 4-channel ones as BGRA, so the wheel turns the other way in memory
+    step = thirds if image.shape[2] == 4 else -thirds
+    pairs = [index for channel in range(3) for index in ((channel + step) % 3, channel)]
+    if image.shape[2] == 4:
+        pairs += [3, 3]
 
+    cv2.mixChannels([image], [out], pairs)
+    return out
 
-def brightness(image_arr: ft.Ref[np.ndarray], brightness_factor: list[float]):
-    if image_arr.value is None or brightness_factor is None:
-        return
+
+def brightness(image: np.ndarray, brightness_factor: list[float], out: Optional[np.ndarray] = None) -> np.ndarray:
+    if brightness_factor is None:
+        return image
     
-    if image_arr.value.shape[2] == 3: # RGB no alpha
-        bgr_image = image_arr.value
+    return apply_tone(image, compile_tone([('brightness', brightness_factor)]), out)
 
-        hsv_image = cv2.cvtColor(bgr_image, cv2.COLOR_BGR2HSV)
-        hsv_image[:, :, 2] = np.clip(hsv_image[:, :, 2] + brightness_factor[0], 0, 255)
-        bgr_image = cv2.cvtColor(hsv_image, cv2.COLOR_HSV2BGR)
 
-        image_arr.value = bgr_image
+def saturation(image: np.ndarray, saturation_factor: list[float], out: Optional[np.ndarray] = None) -> np.ndarray:
+    if saturation_factor is None:
+        return image
 
-    elif image_arr.value.shape[2] == 4: # RGB alpha
-        bgr_image = image_arr.value[:, :, :3]
-        alpha_channel = image_arr.value[:, :, 3]
+    # lowering saturation never leaves the gamut, so it runs in RGB; raising it has to clip chroma
+    # per pixel, which costs more than the HSV round trip it would save
+    factor = saturation_factor[0]
+    if factor <= 1:
+        factor = max(factor, 0)
+        return run_tiled(image, lambda tile, _, tile_out: saturation_tile(tile, factor, tile_out), out=out, buffered=True)
 
-        hsv_image = cv2.cvtColor(bgr_image, cv2.COLOR_BGR2HSV)
-        hsv_image[:, :, 2] = np.clip(hsv_image[:, :, 2] + brightness_factor[0], 0, 255)
-        bgr_image = cv2.cvtColor(hsv_image, cv2.COLOR_HSV2BGR)
+    return apply_tone(image, compile_tone([('saturation', saturation_factor)]), out)
 
-        image_arr.value = np.dstack((bgr_image, alpha_channel))
 
+def saturation_tile(image: np.ndarray, factor: float, out: Optional[np.ndarray] = None) -> np.ndarray:
+    # with the maximum channel V held fixed, scaling HSV saturation is c' = V + factor * (c - V)
+    planes = cv2.split(image)
+    value = cv2.max(cv2.max(planes[0], planes[1]), planes[2])
+    adjusted = cv2.addWeighted(image, factor, cv2.merge((value,) * image.shape[2]), 1 - factor, 0, dst=out)
+    if image.shape[2] == 4:
+        adjusted[:, :, 3] = image[:, :, 3]
 
-def saturation(image_arr: ft.Ref[np.ndarray], saturation_factor: list[float]) -> None:
-    if image_arr.value is None or saturation_factor is None :
-        return
+    return adjusted
 
-    if image_arr.value.shape[2] == 3:
-        bgr_image = image_arr.value
 
-        hsv_image = cv2.cvtColor(bgr_image, cv2.COLOR_BGR2HSV)
-        hsv_image[:, :, 1] = np.clip(hsv_image[:, :, 1] * saturation_factor[0], 0, 255)
-        bgr_image = cv2.cvtColor(hsv_image, cv2.COLOR_HSV2BGR)
+def contrast(image: np.ndarray, contrast_factor: list[float], out: Optional[np.ndarray] = None) -> np.ndarray:
+    if contrast_factor is None:
+        return image
 
-        image_arr.value = bgr_image
+    # on its own a single saturating multiply-add beats a table lookup; next to other tone steps
+    # contrast is folded into their lookup table by the preset compiler instead
+    contrast = contrast_factor[0]
+    brightness = int(round(255 * (1 - contrast) / 2))
 
-    elif image_arr.value.shape[2] == 4:
-        bgr_image = image_arr.value[:, :, :3]
-        alpha_channel = image_arr.value[:, :, 3]
+    return run_tiled(image, lambda tile, _, tile_out: contrast_tile(tile, contrast, brightness, tile_out), out=out, buffered=True)
 
-        hsv_image = cv2.cvtColor(bgr_image, cv2.COLOR_BGR2HSV)
-        hsv_image[:, :, 1] = np.clip(hsv_image[:, :, 1] * saturation_factor[0], 0, 255)
-        bgr_image = cv2.cvtColor(hsv_image, cv2.COLOR_HSV2BGR)
 
-        image_arr.value = np.dstack((bgr_image, alpha_channel))
+def contrast_tile(image: np.ndarray, contrast: float, brightness: int, out: Optional[np.ndarray] = None) -> np.ndarray:
+    # alpha goes through the multiply-add with the colour and is copied back,
+    # which is cheaper than splitting the channels apart
+    adjusted = cv2.addWeighted(image, contrast, image, 0, brightness, dst=out)
+    if image.shape[2] == 4:
+        adjusted[:, :, 3] = image[:, :, 3]
 
+    return adjusted
 
-def contrast(image_arr: ft.Ref[np.ndarray], contrast_factor: list[float]) -> None:
-    if image_arr.value is None or contrast_factor is None:
-        return
-    
-    if len(image_arr.value.shape) == 3 and image_arr.value.shape[2] == 4:
-            bgr_image = image_arr.value[:, :, :3]
-            alpha_channel = image_arr.value[:, :, 3]
 
-            contrast = contrast_factor[0]
-            brightness = int(round(255 * (1 - contrast) / 2))
-            adjusted = cv2.addWeighted(bgr_image, contrast, bgr_image, 0, brightness)
+# gradients and vignette distance fields are reused across edits of the same size, within a byte budget:
+# working-size fields stay cached, a full-resolution one is built for its run and dropped
+FIELD_CACHE_BYTES = 64 * 1024 ** 2
 
-            adjusted_with_alpha = np.dstack((adjusted, alpha_channel))
+field_cache: OrderedDict[Hashable, np.ndarray] = OrderedDict()
+field_cache_lock = Lock()
 
-            image_arr.value = adjusted_with_alpha
-    else:
-        contrast = contrast_factor[0]
-        brightness = int(round(255 * (1 - contrast) / 2))
-        adjusted = cv2.addWeighted(image_arr.value, contrast, image_arr.value, 0, brightness)
 
-        image_arr.value = adjusted
+def cached_field(key: Hashable, build: Callable[[], np.ndarray]) -> np.ndarray:
+    with field_cache_lock:
+        if key in field_cache:
+            field_cache.move_to_end(key)
+            return field_cache[key]
+
+    field = build()
+    field.flags.writeable = False
+    if field.nbytes > FIELD_CACHE_BYTES:
+        return field
+
+    with field_cache_lock:
+        field_cache[key] = field
+        while sum(cached.nbytes for cached in field_cache.values()) > FIELD_CACHE_BYTES:
+            field_cache.popitem(last=False)
+
+    return field
 
 
 def generate_gradient(
@@ -203,61 +225,62 @@ def generate_gradient(
         color_start: tuple[int, int, int], 
         color_end: tuple[int, int, int]
     ) -> np.ndarray:
-    
+
+    key = ('gradient', width, height, direction, tuple(color_start), tuple(color_end))
+    return cached_field(key, lambda: build_gradient(width, height, direction, color_start, color_end))
+
+
+def build_gradient(
+        width: int, 
+        height: int, 
+        direction: str, 
+        color_start: tuple[int, int, int], 
+        color_end: tuple[int, int, int]
+    ) -> np.ndarray:
+
     gradient = np.zeros((height, width, 3), dtype=np.uint8)
 
     if direction == 'horizontal':
-        for x in range(width):
-            gradient[:, x, 0] = np.interp(x, (0, width - 1), (color_start[0], color_end[0]))
-            gradient[:, x, 1] = np.interp(x, (0, width - 1), (color_start[1], color_end[1]))
-            gradient[:, x, 2] = np.interp(x, (0, width - 1), (color_start[2], color_end[2]))
-            
+        x = np.arange(width)
+        for channel in range(3):
+            gradient[:, :, channel] = np.interp(x, (0, width - 1), (color_start[channel], color_end[channel]))
+
     elif direction == 'vertical':
-        for y in range(height):
-            gradient[y, :, 0] = np.interp(y, (0, height - 1), (color_start[0], color_end[0]))
-            gradient[y, :, 1] = np.interp(y, (0, height - 1), (color_start[1], color_end[1]))
-            gradient[y, :, 2] = np.interp(y, (0, height - 1), (color_start[2], color_end[2]))
-            
+        y = np.arange(height)
+        for channel in range(3):
+            gradient[:, :, channel] = np.interp(y, (0, height - 1), (color_start[channel], color_end[channel]))[:, np.newaxis]
+
     elif direction == 'diagonal':
-        for y in range(height):
-            for x in range(width):
-                t = min(x / width, y / height)
-                gradient[y, x, 0] = int(color_start[0] + t * (color_end[0] - color_start[0]))
-                gradient[y, x, 1] = int(color_start[1] + t * (color_end[1] - color_start[1]))
-                gradient[y, x, 2] = int(color_start[2] + t * (color_end[2] - color_start[2]))
-    
+        x = np.arange(width) / width
+        y = np.arange(height) / height
+        t = np.minimum(x[np.newaxis, :], y[:, np.newaxis])
+        for channel in range(3):
+            gradient[:, :, channel] = color_start[channel] + t * (color_end[channel] - color_start[channel])
+
     elif direction == 'radial':
         center_x = width / 2
         center_y = height / 2
         max_distance = np.sqrt(center_x ** 2 + center_y ** 2)
-        for y in range(height):
-            for x in range(width):
-                distance = np.sqrt((x - center_x) ** 2 + (y - center_y) ** 2)
-                t = min(distance / max_distance, 1)
-                gradient[y, x, 0] = int(color_start[0] + t * (color_end[0] - color_start[0]))
-                gradient[y, x, 1] = int(color_start[1] + t * (color_end[1] - color_start[1]))
-                gradient[y, x, 2] = int(color_start[2] + t * (color_end[2] - color_start[2]))
+        x = (np.arange(width) - center_x) ** 2
+        y = (np.arange(height) - center_y) ** 2
+        t = np.minimum(np.sqrt(x[np.newaxis, :] + y[:, np.newaxis]) / max_distance, 1)
+        for channel in range(3):
+            gradient[:, :, channel] = color_start[channel] + t * (color_end[channel] - color_start[channel])
 
     return gradient
 
 
-def apply_gradient(image: np.ndarray, gradient: np.ndarray, opacity: float) -> np.ndarray:
-    if len(image.shape) == 3 and image.shape[2] == 4:
-        bgr_image = image[:, :, :3]
-        alpha_channel = image[:, :, 3]
+def apply_gradient(image: np.ndarray, gradient: np.ndarray, opacity: float, out: Optional[np.ndarray] = None) -> np.ndarray:
+    bgr_image, alpha_channel = split_alpha(image)
 
-        non_transparent_pixels = np.where(alpha_channel > 0, True, False)
+    if alpha_channel is None:
+        return cv2.addWeighted(bgr_image, 1 - opacity, gradient, opacity, 0, dst=out)
 
-        blended_bgr = cv2.addWeighted(bgr_image, 1 - opacity, gradient, opacity, 0)
-        
-        alpha_mask = np.zeros_like(alpha_channel)
-        alpha_mask[non_transparent_pixels] = 255
+    blended_bgr = cv2.addWeighted(bgr_image, 1 - opacity, gradient, opacity, 0)
 
-        blended_image = np.dstack((blended_bgr, alpha_mask))
-    else:
-        blended_image = cv2.addWeighted(image, 1 - opacity, gradient, opacity, 0)
-
-    return blended_image
+    # every pixel that is at least partly visible becomes opaque under the gradient
+    alpha_mask = np.where(alpha_channel > 0, 255, 0).astype(np.uint8)
+    return merge_alpha(blended_bgr, alpha_mask, out)
 
 
 def hex_to_rgb(hex_color: str) -> tuple[int, int, int]:
@@ -270,9 +293,9 @@ def hex_to_rgb(hex_color: str) -> tuple[int, int, int]:
     return red, green, blue
 
 
-def gradient_overlay(image_arr: ft.Ref[np.ndarray], values: list) -> None:
-    if values is None or image_arr.value is None:
-        return 
+def gradient_overlay(image: np.ndarray, values: list, out: Optional[np.ndarray] = None) -> np.ndarray:
+    if values is None:
+        return image
     
     direction = values[0]
     first_color = values[1]
@@ -280,304 +303,295 @@ def gradient_overlay(image_arr: ft.Ref[np.ndarray], values: list) -> None:
     opacity = values[3]
 
     gradient = generate_gradient(
-        image_arr.value.shape[1],
-        image_arr.value.shape[0],
+        image.shape[1],
+        image.shape[0],
         direction=direction,
         color_start=hex_to_rgb(first_color),
         color_end=hex_to_rgb(second_color)
     )
 
-    image_arr.value = apply_gradient(image_arr.value, gradient, opacity)
+    def gradient_tile(tile: np.ndarray, region: TileRegion, tile_out: Optional[np.ndarray]) -> np.ndarray:
+        top, left = region[:2]
+        return apply_gradient(tile, gradient[top:top + tile.shape[0], left:left + tile.shape[1]], opacity, tile_out)
+
+    return run_tiled(image, gradient_tile, out=out, buffered=True)
 
 
-def solid_overlay(image_arr: ft.Ref[np.ndarray], values: list) -> None:
-    if values is None or image_arr.value is None:
-        return 
+def solid_overlay(image: np.ndarray, values: list, out: Optional[np.ndarray] = None) -> np.ndarray:
+    if values is None:
+        return image
     
     color = hex_to_rgb(values[0])
     opacity = values[1]
-    height, width = image_arr.value.shape[:2]
 
-    solid_color = np.full((height, width, 3), color, dtype=np.uint8)
-    blended_image = cv2.addWeighted(image_arr.value, 1 - opacity, solid_color, opacity, 0)
+    return run_tiled(
+        image,
+        lambda tile, _, tile_out: apply_color(tile, lambda bgr, bgr_out: solid_overlay_tile(bgr, color, opacity, bgr_out), tile_out),
+        out=out,
+        buffered=True
+    )
 
-    image_arr.value = blended_image
-        
 
-def noise(image_arr: ft.Ref[np.ndarray], noise_intensity: list[float]) -> None:
-    if image_arr.value is None:
-        return
-    
-    noise = np.random.normal(scale=noise_intensity[0], size=image_arr.value.shape).astype(np.uint8)
-    noisy_image = cv2.add(image_arr.value, noise)
-    
-    if image_arr.value.shape[2] == 3:
-        image_arr.value = noisy_image
+def solid_overlay_tile(image: np.ndarray, color: tuple[int, int, int], opacity: float, out: Optional[np.ndarray] = None) -> np.ndarray:
+    solid_color = frame_pool.acquire(image.shape, image.dtype)
+    solid_color[:] = color
+
+    blended_image = cv2.addWeighted(image, 1 - opacity, solid_color, opacity, 0, dst=out)
+    frame_pool.release(solid_color)
 
-    elif image_arr.value.shape[2] == 4:
-        alpha_channel = image_arr.value[:, :, 3]
-        transparent_pixels = np.where(alpha_channel == 0, True, False)
-        noisy_image[transparent_pixels] = image_arr.value[transparent_pixels]
+    return blended_image
         
-        image_arr.value = noisy_image
 
 
-def vignette(image_arr: ft.Ref[np.ndarray], vignette_intensity: list[float]) -> None:
-    if image_arr.value is None or vignette_intensity is None:
-        return
+def vignette(image: np.ndarray, vignette_intensity: list[float], out: Optional[np.ndarray] = None) -> np.ndarray:
+    if vignette_intensity is None:
+        return image
     
-    height, width = image_arr.value.shape[:2]
+    distance = cached_field(('vignette', image.shape[0], image.shape[1]), lambda: vignette_distance(image.shape[0], image.shape[1]))
+    return run_tiled(image, lambda tile, region, tile_out: vignette_tile(tile, vignette_intensity, distance, region, tile_out), out=out, buffered=True)
+
+
+def vignette_distance(height: int, width: int) -> np.ndarray:
     y, x = np.ogrid[:height, :width]
 
     center_x = width / 2
     center_y = height / 2
-    distance = np.sqrt((x - center_x) ** 2 + (y - center_y) ** 2)
-    
     max_distance = math.sqrt(center_x ** 2 + center_y ** 2)
-    distance_normalized = distance / max_distance
-    
-    vignette_mask = 1 - vignette_intensity * distance_normalized
-    vignette_mask = np.clip(vignette_mask, 0, 1)
-    
-    if len(image_arr.value.shape) == 3:
-        image = image_arr.value.copy()
-        for i in range(3):
-            image[:, :, i] = image[:, :, i] * vignette_mask
 
-        image_arr.value = image
+    return np.sqrt(((x - center_x) / max_distance) ** 2 + ((y - center_y) / max_distance) ** 2).astype(np.float32)
 
 
-def inversion(image_arr: ft.Ref[np.ndarray], values: Optional[list]) -> None:
-    if image_arr.value is None:
-        return
-    
-    if image_arr.value.shape[2] == 3:
-        inverted_image = 255 - image_arr.value
-        image_arr.value = inverted_image
-
-    elif image_arr.value.shape[2] == 4:
-        bgr_image = image_arr.value[:, :, :3]
-        alpha_channel = image_arr.value[:, :, 3]
+def vignette_tile(image: np.ndarray, vignette_intensity: list[float], distance: np.ndarray, region: TileRegion, out: Optional[np.ndarray] = None) -> np.ndarray:
+    top, left = region[:2]
+    distance = distance[top:top + image.shape[0], left:left + image.shape[1]]
 
-        inverted_image = 255 - bgr_image
-        image_arr.value = np.dstack((inverted_image, alpha_channel))
+    # the normalized distance field is built once per size, the intensity only scales it
+    vignette_mask = 1 - np.float32(vignette_intensity[0]) * distance
+    np.clip(vignette_mask, 0, 1, out=vignette_mask)
 
+    if out is None:
+        out = np.empty_like(image)
 
-def grayscale(image_arr: ft.Ref[np.ndarray], values: Optional[list]) -> None:
-    if image_arr.value is None:
-        return
-    
-    if image_arr.value.shape[2] == 4:
-        bgr_image = image_arr.value[:, :, :3]
-        alpha_channel = image_arr.value[:, :, 3]
-
-        grayscale_image = cv2.cvtColor(bgr_image, cv2.COLOR_BGR2GRAY)
-        grayscale_with_alpha = np.dstack((grayscale_image, grayscale_image, grayscale_image, alpha_channel))
-
-        image_arr.value = grayscale_with_alpha
-
+    if len(image.shape) == 3:
+        color, alpha = split_alpha(image)
+        np.multiply(color, vignette_mask[:, :, np.newaxis], out=out[:, :, :3], casting='unsafe')
+        if alpha is not None:
+            out[:, :, 3] = alpha
     else:
-        grayscale_image = cv2.cvtColor(image_arr.value, cv2.COLOR_BGR2GRAY)
-        rgb_image = np.dstack((grayscale_image, grayscale_image, grayscale_image))
-
-        image_arr.value = rgb_image
-
-
-def sepia(image_arr: ft.Ref[np.ndarray], values: Optional[list]=None) -> None:
-    if image_arr.value is None:
-        return
-
-    sepia_matrix = np.array(
-        [
-            [0.6, 0.769, 0.189],
-            [0.5, 0.686, 0.168],
-            [0.4, 0.534, 0.131]
-        ]
-    )
-
-    if image_arr.value.shape[2] == 3:
-        bgr_image = image_arr.value
-
-        sepia_image = np.dot(bgr_image, sepia_matrix.T)
-        sepia_image = np.clip(sepia_image, 0, 255).astype(np.uint8)
-
-        image_arr.value = sepia_image
+        out[:] = image
+
+    return out
+
+
+def inversion(image: np.ndarray, values: Optional[list], out: Optional[np.ndarray] = None) -> np.ndarray:
+    # on its own one numpy subtraction beats a table lookup, like contrast
+    _, alpha = split_alpha(image)
+    if alpha is not None:
+        alpha = alpha.copy()
+
+    inverted = np.subtract(255, image, out=out, dtype=np.uint8)
+    if alpha is not None:
+        inverted[:, :, 3] = alpha
+
+    return inverted
+
+
+def grayscale(image: np.ndarray, values: Optional[list], out: Optional[np.ndarray] = None) -> np.ndarray:
+    return apply_tone(image, compile_tone([('black & white', values)]), out)
+
+
+def sepia(image: np.ndarray, values: Optional[list]=None, out: Optional[np.ndarray] = None) -> np.ndarray:
+    return apply_tone(image, compile_tone([('sepia', values)]), out)
+
+
+def preset_steps(name: str, strenght: list[float]) -> list[Step]:
+    match name:
+        case 'vintage':
+            return [
+                ('blur', [0.3]),
+                ('noise', [max(0.4, strenght[0] * 0.5)] + strenght[1:2]),
+                ('vignette', [max(0.3, strenght[0] * 0.7)]),
+                ('sepia', None),
+                ('saturation', [1.2]),
+                ('vignette', [0.2]),
+                ('brightness', [min(-6, strenght[0] * -16)])
+            ]
+        case 'retro':
+            return [
+                ('color adjustments', [0.9, 0.95, 1.1]),
+                ('saturation', [max(1.1, strenght[0] * 1.3)]),
+                ('contrast', [max(1.1, strenght[0] * 1.3)]),
+                ('brightness', [min(-12.0, strenght[0] * -30.0)]),
+                ('blur', [0.5]),
+                ('sharpen', [0.7]),
+                ('brightness', [max(8.0, strenght[0] * 15.0)]),
+                ('contrast', [1.3]),
+                ('brightness', [min(-12.0, strenght[0] * -30.0)]),
+                ('gradient overlay', ['vertical', '#7a8dad', '#b28a7a', strenght[0] * 0.4]),
+                ('sharpen', [1.3])
+            ]
+        case 'mojave':
+            return [
+                ('saturation', [0.8]),
+                ('gradient overlay', ['vertical', '#b6760d', '#433636', strenght[0] * 0.5]),
+                ('blur', [0.7]),
+                ('brightness', [strenght[0] * 15]),
+                ('contrast', [1.3])
+            ]
+        case 'nostalgia':
+            return [
+                ('saturation', [0.8]),
+                ('gradient overlay', ['vertical', '#f7b08d', '#805404', strenght[0] * 0.3]),
+                ('blur', [max(0.4, strenght[0] * 1)]),
+                ('brightness', [strenght[0] * 10]),
+                ('contrast', [0.9]),
+                ('sharpen', [0.7])
+            ]
+        case 'clean':
+            return [
+                ('contrast', [max(1, strenght[0] * 1.2)]),
+                ('saturation', [max(1, strenght[0] * 1.3)]),
+                ('sharpen', [0.6]),
+                ('gradient overlay', ['diagonal', '#9acbf5', '#fad2af', strenght[0] * 0.5]),
+                ('saturation', [max(1, strenght[0] * 1.3)])
+            ]
+        case 'neon':
+            return [
+                ('gradient overlay', ['horizontal', '#9402c9', '#00c4c1', strenght[0] * 0.5]),
+                ('contrast', [max(strenght[0] * 2, 1.3)]),
+                ('saturation', [1.3]),
+                ('sharpen', [1.5])
+            ]
+        case 'twilight':
+            return [
+                ('saturation', [0.8]),
+                ('color adjustments', [0.95, 1.25, 1.25]),
+                ('gradient overlay', ['vertical', '#184035', '#122a42', strenght[0] * 0.4]),
+                ('saturation', [max(strenght[0] * 1.3, 1)]),
+                ('contrast', [max(strenght[0] * 1.3, 1)]),
+                ('brightness', [strenght[0] * -5]),
+                ('sharpen', [strenght[0] * 0.8]),
+                ('vignette', [0.8])
+            ]
+        case _:
+            return []
+
+
+PRESETS = ('vintage', 'retro', 'mojave', 'nostalgia', 'clean', 'neon', 'twilight')
+
+# operations that draw noise; a seed follows their first value
+RANDOM_OPERATIONS = ('noise', 'vintage')
+
+
+def apply_preset(name: str, image: np.ndarray, strenght: list[float]) -> np.ndarray:
+    if strenght is None:
+        return image
+
+    return run_preset(image, preset_steps(name, strenght), image_processing_functions, buffered_operations=BUFFERED_OPERATIONS)
+
+
+def vintage(image: np.ndarray, strenght: list[float]) -> np.ndarray:
+    return apply_preset('vintage', image, strenght)
+
+
+def retro(image: np.ndarray, strenght: list[float]) -> np.ndarray:
+    return apply_preset('retro', image, strenght)
+
+
+def mojave(image: np.ndarray, strenght: list[float]) -> np.ndarray:
+    return apply_preset('mojave', image, strenght)
+
+
+def nostalgia(image: np.ndarray, strenght: list[float]) -> np.ndarray:
+    return apply_preset('nostalgia', image, strenght)
+
+
+def clean(image: np.ndarray, strenght: list[float]) -> np.ndarray:
+    return apply_preset('clean', image, strenght)
+
+
+def neon(image: np.ndarray, strenght: list[float]) -> np.ndarray:
+    return apply_preset('neon', image, strenght)
+
+
+def twilight(image: np.ndarray, strenght: list[float]) -> np.ndarray:
+    return apply_preset('twilight', image, strenght)
+
+
+image_processing_functions = {
+    'rotate': rotate,
+    'flip': flip,
+    'resize': resize,
+    'blur': blur,
+    'sharpen': sharpen,
+    'color adjustments': color_adjustments,
+    'hue': hue,
+    'brightness': brightness,
+    'saturation': saturation,
+    'contrast': contrast,
+    'solid overlay': solid_overlay,
+    'gradient overlay': gradient_overlay,
+    'noise': noise,
+    'vignette': vignette,
+    'inversion': inversion,
+    'black & white': grayscale,
+    'sepia': sepia,
+    'vintage': vintage,
+    'retro': retro,
+    'mojave': mojave,
+    'nostalgia': nostalgia,
+    'clean': clean,
+    'neon': neon,
+    'twilight': twilight
+}
+
+# operations that accept an out= destination buffer of the input's shape
+BUFFERED_OPERATIONS = PIXEL_OPERATIONS + ('sharpen', 'solid overlay', 'gradient overlay', 'noise', 'vignette')
+
+
+def scale_values(name: str, values: Optional[list], scale: float) -> Optional[list]:
+    if values is None or scale == 1.0:
+        return values
 
-    elif image_arr.value.shape[2] == 4:
-        bgr_image = image_arr.value[:, :, :3]
-        alpha_channel = image_arr.value[:, :, 3]
+    match name:
+        case 'blur' | 'noise':
+            return [values[0] * scale] + values[1:]
+        case 'sharpen':
+            sigma = values[1] if len(values) > 1 else values[0]
+            return [values[0], sigma * scale]
+        case 'resize':
+            return [max(1, round(int(values[0]) * scale)), max(1, round(int(values[1]) * scale))]
+        case _:
+            return values
 
-        sepia_image = np.dot(bgr_image, sepia_matrix.T)
-        sepia_image = np.clip(sepia_image, 0, 255).astype(np.uint8)
 
-        image_arr.value = np.dstack((sepia_image, alpha_channel))
+def seed_values(name: str, values: Optional[list]) -> Optional[list]:
+    # a committed edit carries its seed, so replaying the history or a recipe draws the same noise
+    if name not in RANDOM_OPERATIONS or values is None or len(values) > 1:
+        return values
 
+    return values + [new_seed()]
 
-def vintage(image_arr: ft.Ref[np.ndarray], strenght: list[float]) -> None:
-    if image_arr.value is None or strenght is None:
-        return
-    
-    blur(image_arr, [0.3])
-    noise(image_arr, [max(0.4, strenght[0] * 0.5)])
-    vignette(image_arr, [max(0.3, strenght[0] * 0.7)])
-    sepia(image_arr)
-    saturation(image_arr, [1.2])
-    vignette(image_arr, [0.2])
-    brightness(image_arr, [min(-6, strenght[0] * -16)])
-
-
-def retro(image_arr: ft.Ref[np.ndarray], strenght: list[float]) -> None:
-    if image_arr.value is None or strenght is None:
-        return
-    
-    color_adjustments(image_arr, [0.9, 0.95, 1.1])
-    saturation(image_arr, [max(1.1, strenght[0] * 1.3)])
-    contrast(image_arr, [max(1.1, strenght[0] * 1.3)])
-    brightness(image_arr, [min(-12.0, strenght[0] * -30.0)])
-    blur(image_arr, [0.5])
-    sharpen(image_arr, [0.7])
-    brightness(image_arr, [max(8.0, strenght[0] * 15.0)])
-    contrast(image_arr, [1.3])
-    brightness(image_arr, [min(-12.0, strenght[0] * -30.0)])
-    gradient = generate_gradient(
-        image_arr.value.shape[1], 
-        image_arr.value.shape[0], 
-        direction='vertical', 
-        color_start=(122, 141, 173), 
-        color_end=(178, 138, 122)
-    )
-    image_arr.value = apply_gradient(image_arr.value, gradient, strenght[0] * 0.4)
-    sharpen(image_arr, [1.3])
-
-
-def mojave(image_arr: ft.Ref[np.ndarray], strenght: list[float]) -> None:
-    if image_arr.value is None or strenght is None:
-        return
-    
-    saturation(image_arr, [0.8])
-    gradient = generate_gradient(
-        image_arr.value.shape[1], 
-        image_arr.value.shape[0], 
-        direction='vertical', 
-        color_start=(182, 118, 13), 
-        color_end=(67, 54, 54)
-    )
-    image_arr.value = apply_gradient(image_arr.value, gradient, strenght[0] * 0.5)
-    blur(image_arr, [0.7])
-    brightness(image_arr, [strenght[0] * 15])
-    contrast(image_arr, [1.3])
 
+def proxy_steps(name: str, values: Optional[list], scale: float) -> list[Step]:
+    if name in PRESETS:
+        steps = preset_steps(name, values) if values is not None else []
+    else:
+        steps = [(name, values)]
 
-def nostalgia(image_arr: ft.Ref[np.ndarray], strenght: list[float]) -> None:
-    if image_arr.value is None or strenght is None:
-        return
-    
-    saturation(image_arr, [0.8])
-    gradient = generate_gradient(
-        image_arr.value.shape[1], 
-        image_arr.value.shape[0], 
-        direction='vertical', 
-        color_start=(247, 176, 141), 
-        color_end=(128, 84, 4)
-    )
-    image_arr.value = apply_gradient(image_arr.value, gradient, strenght[0] * 0.3)
-    blur(image_arr, [max(0.4, strenght[0] * 1)])
-    brightness(image_arr, [strenght[0] * 10])
-    contrast(image_arr, [0.9])
-    sharpen(image_arr, [0.7])
-
+    return [(step_name, scale_values(step_name, step_values, scale)) for step_name, step_values in steps]
 
-def clean(image_arr: ft.Ref[np.ndarray], strenght: list[float]) -> None:
-    if image_arr.value is None or strenght is None:
-        return
-    
-    contrast(image_arr, [max(1, strenght[0] * 1.2)])
-    saturation(image_arr, [max(1, strenght[0] * 1.3)])
-    sharpen(image_arr, [0.6])
 
-    gradient = generate_gradient(
-        image_arr.value.shape[1], 
-        image_arr.value.shape[0], 
-        direction='diagonal', 
-        color_start=(154, 203, 245), 
-        color_end=(250, 210, 175)
-    )
-    
-    image_arr.value = apply_gradient(image_arr.value, gradient, strenght[0] * 0.5)
-    saturation(image_arr, [max(1, strenght[0] * 1.3)])
+def apply_operation(image: np.ndarray, name: str, values: Optional[list], scale: float = 1.0, cancel_event: Optional[Event] = None) -> np.ndarray:
+    if name not in image_processing_functions:
+        return image
 
-def neon(image_arr: ft.Ref[np.ndarray], strenght: list[float]) -> None:
-    if image_arr.value is None or strenght is None:
-        return
-    
-    gradient = generate_gradient(
-        image_arr.value.shape[1], 
-        image_arr.value.shape[0], 
-        direction='horizontal', 
-        color_start=(148, 2, 201), 
-        color_end=(0, 196, 193)
-    )
-    image_arr.value = apply_gradient(image_arr.value, gradient, strenght[0] * 0.5)
-    contrast(image_arr, [max(strenght[0] * 2, 1.3)])
-    saturation(image_arr, [1.3])
-    sharpen(image_arr, [1.5])
+    return run_preset(image, proxy_steps(name, values, scale), image_processing_functions, cancel_event, BUFFERED_OPERATIONS)
 
 
-def twilight(image_arr: ft.Ref[np.ndarray], strenght: list[float]) -> None:
-    if image_arr.value is None or strenght is None:
-        return
+def apply_steps(image: np.ndarray, steps: list[Step], scale: float = 1.0, cancel_event: Optional[Event] = None) -> np.ndarray:
+    # steps are not fused across operations: every operation rounds its own result, exactly as it did when it was applied
+    for name, values in steps:
+        image = apply_operation(image, name, values, scale, cancel_event)
 
-    saturation(image_arr, [0.8])
-    color_adjustments(image_arr, [0.95, 1.25, 1.25])
-    gradient = generate_gradient(
-        image_arr.value.shape[1], 
-        image_arr.value.shape[0], 
-        direction='vertical', 
-        color_start=(24, 64, 53), 
-        color_end=(18, 42, 66)
-    )
-    image_arr.value = apply_gradient(image_arr.value, gradient, strenght[0] * 0.4)
-    saturation(image_arr, [max(strenght[0] * 1.3, 1)])
-    contrast(image_arr, [max(strenght[0] * 1.3, 1)])
-    brightness(image_arr, [strenght[0] * -5])
-    sharpen(image_arr, [strenght[0] * 0.8])
-    vignette(image_arr, [0.8])
-
-
-def add_image_operation(name: str, image_arr: ft.Ref[np.ndarray], image_flet: ft.Image, values: Optional[list] = None) -> Callable:
-    def process_image(image_func: Callable, values: Optional[list] = None):
-        image_func(image_arr, values)
-        add_to_history(image_arr)
-        update_image(image_arr, image_flet)
-
-    image_processing_functions = {
-        'rotate': rotate,
-        'flip': flip,
-        'resize': resize,
-        'blur': blur,
-        'sharpen': sharpen,
-        'color adjustments': color_adjustments,
-        'hue': hue,
-        'brightness': brightness,
-        'saturation': saturation,
-        'contrast': contrast,
-        'solid overlay': solid_overlay,
-        'gradient overlay': gradient_overlay,
-        'noise': noise,
-        'vignette': vignette,
-        'inversion': inversion,
-        'black & white': grayscale,
-        'sepia': sepia,
-        'vintage': vintage,
-        'retro': retro,
-        'mojave': mojave,
-        'nostalgia': nostalgia,
-        'clean': clean,
-        'neon': neon,
-        'twilight': twilight
-    }
-
-    if name in image_processing_functions:
-        process_image(image_processing_functions[name], values)
-
-        
\ No newline at end of file
+    return image
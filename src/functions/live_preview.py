@@ -0,0 +1,91 @@
+import threading
+import numpy as np
+from typing import Callable, Hashable, Optional
+from functions.image_operations import apply_operation
+from functions.display_encoder import encode_preview, fit_to_canvas
+from functions.profiling import span
+
+
+PREVIEW_WIDTH = 700
+PREVIEW_HEIGHT = 390
+DEBOUNCE_SECONDS = 0.04
+
+FrameCallback = Callable[[str, int], None]
+
+
+class LivePreview:
+    lock: threading.Lock
+    timer: Optional[threading.Timer]
+    generation: int
+    base_key: Optional[Hashable]
+    base: Optional[np.ndarray]
+    base_scale: float
+    small: Optional[np.ndarray]
+    shown: bool
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.timer = None
+        self.generation = 0
+        self.base_key = None
+        self.base = None
+        self.base_scale = 1.0
+        self.small = None
+        self.shown = False
+
+    def set_base(self, key: Hashable, image: np.ndarray, scale: float) -> None:
+        with self.lock:
+            self.stop()
+            self.shown = False
+            if key != self.base_key:
+                self.base_key = key
+                self.base = image
+                self.base_scale = scale
+                self.small = None
+
+    def request(self, name: str, values: Optional[list], on_frame: FrameCallback) -> None:
+        with self.lock:
+            if self.base is None:
+                return
+
+            self.stop()
+            self.timer = threading.Timer(DEBOUNCE_SECONDS, self.render, args=(self.generation, name, values, on_frame))
+            self.timer.daemon = True
+            self.timer.start()
+
+    def render(self, generation: int, name: str, values: Optional[list], on_frame: FrameCallback) -> None:
+        with self.lock:
+            if generation != self.generation:
+                return
+
+            # previews are computed and encoded on a cached copy about half the size of the displayed image,
+            # the canvas stretches it over the displayed size
+            if self.small is None:
+                self.small = fit_to_canvas(self.base, PREVIEW_WIDTH, PREVIEW_HEIGHT)
+            small = self.small
+            scale = self.base_scale * small.shape[1] / self.base.shape[1]
+
+        with span(name, 'preview', values=values):
+            image = apply_operation(small, name, values, scale)
+            encoded = encode_preview(image, PREVIEW_WIDTH, PREVIEW_HEIGHT)
+
+        with self.lock:
+            self.shown = True
+        on_frame(encoded, generation)
+
+    def is_current(self, generation: int) -> bool:
+        with self.lock:
+            return generation == self.generation
+
+    def cancel(self) -> bool:
+        with self.lock:
+            self.stop()
+            shown, self.shown = self.shown, False
+
+        return shown
+
+    def stop(self) -> None:
+        self.generation += 1
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
@@ -0,0 +1,69 @@
+import numpy as np
+import cv2
+from functools import lru_cache
+from typing import Optional
+from functions import tiling
+
+
+TEXTURE_SIZE = 256
+NOISE_BLOCK_ROWS = TEXTURE_SIZE
+TEXTURE_CACHE_SIZE = 8
+
+
+def new_seed() -> int:
+    # 32 bits drawn from fresh entropy, small enough to round-trip through any JSON reader
+    return int(np.random.SeedSequence().generate_state(1)[0])
+
+
+def block_generator(seed: int, block: int) -> np.random.Generator:
+    # every block of rows has its own stream, so the result does not depend on how blocks are scheduled
+    return np.random.Generator(np.random.PCG64(np.random.SeedSequence(seed, spawn_key=(block,))))
+
+
+@lru_cache(maxsize=TEXTURE_CACHE_SIZE)
+def noise_texture(sigma: float, channels: int, seed: int) -> np.ndarray:
+    texture = block_generator(seed, 0).standard_normal((TEXTURE_SIZE, TEXTURE_SIZE, channels), dtype=np.float32)
+    texture *= sigma
+    texture.flags.writeable = False
+
+    return texture
+
+
+def noise_block(shape: tuple[int, ...], top: int, sigma: float, seed: int, texture: bool) -> np.ndarray:
+    rows, width = shape[:2]
+    channels = shape[2] if len(shape) == 3 else 1
+
+    if texture:
+        # blocks start on texture boundaries, so only the columns need repeating
+        tile = noise_texture(sigma, channels, seed)[:rows]
+        field = np.tile(tile, (1, -(-width // TEXTURE_SIZE), 1))[:, :width]
+    else:
+        field = block_generator(seed, top // NOISE_BLOCK_ROWS).standard_normal((rows, width, channels), dtype=np.float32)
+        field *= sigma
+
+    return field.reshape(shape)
+
+
+def add_noise(image: np.ndarray, sigma: float, seed: Optional[int] = None, texture: bool = False, out: Optional[np.ndarray] = None) -> np.ndarray:
+    seed = new_seed() if seed is None else int(seed)
+    height = image.shape[0]
+
+    if out is None:
+        out = np.empty_like(image)
+
+    def process(top: int) -> None:
+        bottom = min(top + NOISE_BLOCK_ROWS, height)
+        block = image[top:bottom]
+
+        # float32 noise is added with saturation, so negative samples darken instead of wrapping to white
+        field = noise_block(block.shape, top, sigma, seed, texture)
+        out[top:bottom] = cv2.add(block, field, dtype=cv2.CV_8U).reshape(block.shape)
+
+    blocks = range(0, height, NOISE_BLOCK_ROWS)
+    if tiling.tile_workers == 1 or len(blocks) == 1:
+        for top in blocks:
+            process(top)
+    else:
+        list(tiling.get_executor().map(process, blocks))
+
+    return out
@@ -0,0 +1,103 @@
+from typing import Callable, Optional
+from functions.image_operations import image_processing_functions, BUFFERED_OPERATIONS
+from functions.tone_engine import VALUELESS_OPERATIONS
+
+
+PIXEL = 'pixel'
+LUT = 'lut'
+MATRIX = 'matrix'
+NEIGHBORHOOD = 'neighborhood'
+GEOMETRIC = 'geometric'
+GENERATOR = 'generator'
+PRESET = 'preset'
+
+# kinds compile_preset groups into one tone stage when they are adjacent
+FUSIBLE_KINDS = (LUT, MATRIX)
+
+
+class OperationInfo:
+    name: str
+    function: Callable
+    kind: str
+    touches_alpha: bool
+    buffered: bool
+    resamplable: bool
+    cost: float
+    cost_per_unit: float
+    cost_parameter: Optional[int]
+
+    def __init__(
+            self,
+            name: str,
+            kind: str,
+            touches_alpha: bool,
+            resamplable: bool,
+            cost: float,
+            cost_per_unit: float = 0.0,
+            cost_parameter: Optional[int] = None
+        ) -> None:
+
+        self.name = name
+        self.function = image_processing_functions[name]
+        self.kind = kind
+        self.touches_alpha = touches_alpha
+        self.buffered = name in BUFFERED_OPERATIONS
+        # whether running it on a downscaled image gives (up to rounding) the downscaled result,
+        # with pixel-sized parameters scaled along
+        self.resamplable = resamplable
+        # single-thread nanoseconds per input pixel, growing linearly with one parameter (e.g. a kernel sigma)
+        self.cost = cost
+        self.cost_per_unit = cost_per_unit
+        self.cost_parameter = cost_parameter
+
+    def estimate(self, values: Optional[list], pixels: int) -> float:
+        if values is None and self.name not in VALUELESS_OPERATIONS + ('rotate',):
+            return 0.0
+
+        cost = self.cost
+        if self.cost_parameter is not None and values:
+            # a missing parameter falls back to the last given one, as sharpen does with its sigma
+            cost += self.cost_per_unit * float(values[min(self.cost_parameter, len(values) - 1)])
+
+        return cost * pixels * 1e-9
+
+
+# costs measured with benchmarks.operations on a 12 MP RGB image, one tile worker
+operation_registry = {
+    info.name: info for info in (
+        OperationInfo('rotate', GEOMETRIC, True, True, 4.9),
+        OperationInfo('flip', GEOMETRIC, True, True, 1.3),
+        OperationInfo('resize', GEOMETRIC, True, False, 0.7),
+        OperationInfo('blur', NEIGHBORHOOD, True, True, 70.0),
+        OperationInfo('sharpen', NEIGHBORHOOD, False, True, 4.0, 6.5, 1),
+        OperationInfo('color adjustments', LUT, False, True, 6.4),
+        OperationInfo('hue', LUT, False, True, 11.8),
+        OperationInfo('brightness', LUT, False, True, 11.6),
+        OperationInfo('saturation', LUT, False, True, 11.5),
+        OperationInfo('contrast', LUT, False, True, 1.7),
+        OperationInfo('solid overlay', PIXEL, False, True, 7.9),
+        OperationInfo('gradient overlay', GENERATOR, True, True, 1.9),
+        OperationInfo('noise', GENERATOR, False, False, 60.2),
+        OperationInfo('vignette', GENERATOR, False, True, 25.5),
+        OperationInfo('inversion', LUT, False, True, 0.7),
+        OperationInfo('black & white', MATRIX, False, True, 1.9),
+        OperationInfo('sepia', MATRIX, False, True, 2.4),
+        OperationInfo('vintage', PRESET, True, False, 176.6),
+        OperationInfo('retro', PRESET, True, False, 97.5),
+        OperationInfo('mojave', PRESET, True, False, 97.2),
+        OperationInfo('nostalgia', PRESET, True, False, 108.3),
+        OperationInfo('clean', PRESET, True, False, 32.7),
+        OperationInfo('neon', PRESET, True, False, 27.6),
+        OperationInfo('twilight', PRESET, True, False, 75.8)
+    )
+}
+
+# a fused tone stage costs one pass per run of steps sharing a colour space, not one per operation
+PASS_COSTS = {'hsv': 11.6, 'rgb': 3.2, 'matrix': 2.4}
+
+
+def operation_info(name: str) -> OperationInfo:
+    if name not in operation_registry:
+        raise ValueError(f'unknown operation: {name}')
+
+    return operation_registry[name]
@@ -0,0 +1,205 @@
+import math
+import numpy as np
+from threading import Event
+from typing import Optional
+from functions.image_operations import image_processing_functions, BUFFERED_OPERATIONS, PRESETS, preset_steps, scale_values
+from functions.operation_registry import FUSIBLE_KINDS, GEOMETRIC, NEIGHBORHOOD, PASS_COSTS, operation_info
+from functions.preset_compiler import Step, run_preset
+from functions.tone_engine import VALUELESS_OPERATIONS, compile_tone
+
+
+Size = tuple[int, int]
+
+
+class Plan:
+    steps: list[Step]
+    stages: list[list[Step]]
+    notes: list[str]
+    before: float
+    after: float
+
+    def __init__(self, steps: list[Step], notes: list[str], before: float, after: float) -> None:
+        self.steps = steps
+        self.stages = fuse(steps)
+        self.notes = notes
+        self.before = before
+        self.after = after
+
+    @property
+    def speedup(self) -> float:
+        return self.before / self.after if self.after > 0 else 1.0
+
+    def describe(self) -> str:
+        lines = [f'  {" + ".join(name for name, _ in stage)}' for stage in self.stages]
+        lines += [f'  - {note}' for note in self.notes]
+        lines.append(f'estimated {self.before:.2f}s -> {self.after:.2f}s single threaded ({self.speedup:.1f}x)')
+
+        return '\n'.join(lines)
+
+
+def is_noop(name: str, values: Optional[list]) -> bool:
+    return values is None and name not in VALUELESS_OPERATIONS + ('rotate',)
+
+
+def expand(steps: list[Step]) -> list[Step]:
+    expanded = []
+
+    for name, values in steps:
+        if name in PRESETS:
+            expanded += preset_steps(name, values) if values is not None else []
+        elif not is_noop(name, values):
+            expanded.append((name, values))
+
+    return expanded
+
+
+def next_size(name: str, values: Optional[list], size: Size) -> Size:
+    match name:
+        case 'rotate':
+            return size[1], size[0]
+        case 'resize' if values is not None:
+            return int(values[0]), int(values[1])
+        case _:
+            return size
+
+
+def fuse(steps: list[Step]) -> list[list[Step]]:
+    # mirrors compile_preset: adjacent LUT and colour-matrix steps form one stage, fused when that saves passes
+    stages = []
+
+    for step in steps:
+        fusible = operation_info(step[0]).kind in FUSIBLE_KINDS
+        if fusible and stages and operation_info(stages[-1][-1][0]).kind in FUSIBLE_KINDS:
+            stages[-1].append(step)
+        else:
+            stages.append([step])
+
+    return stages
+
+
+def stage_cost(stage: list[Step], pixels: int) -> float:
+    if len(stage) > 1:
+        passes = compile_tone(stage)
+        if len(passes) < len(stage):
+            return sum(PASS_COSTS[space] for space, _ in passes) * pixels * 1e-9
+
+    return sum(operation_info(name).estimate(values, pixels) for name, values in stage)
+
+
+def estimate(stages: list[list[Step]], size: Size) -> float:
+    total = 0.0
+
+    for stage in stages:
+        total += stage_cost(stage, size[0] * size[1])
+        for name, values in stage:
+            size = next_size(name, values, size)
+
+    return total
+
+
+def estimate_unplanned(steps: list[Step], size: Size) -> float:
+    # what apply_steps costs: every operation on its own, presets fused only within themselves
+    total = 0.0
+
+    for name, values in steps:
+        stages = fuse(expand([(name, values)])) if name in PRESETS else [[(name, values)]]
+        total += estimate(stages, size)
+        for step_name, step_values in (expand([(name, values)]) if name in PRESETS else [(name, values)]):
+            size = next_size(step_name, step_values, size)
+
+    return total
+
+
+# one linear resize aliases once it shrinks by much more than 2x, chained resizes smooth as they go
+MAX_MERGED_DOWNSCALE = 2.0
+
+
+def downscale_factor(size: Size, values: list) -> float:
+    return max(size[0] / int(values[0]), size[1] / int(values[1]))
+
+
+def merge_steps(steps: list[Step], size: Size, notes: list[str]) -> list[Step]:
+    merged = []
+    sizes = [size]
+
+    for name, values in steps:
+        previous = merged[-1] if merged else None
+
+        if name == 'flip' and previous is not None and previous[0] == 'flip' and int(previous[1][0]) == int(values[0]):
+            merged.pop()
+            sizes.pop()
+            notes.append('dropped two flips that cancel out')
+        elif name == 'resize' and previous is not None and previous[0] == 'resize' and downscale_factor(sizes[-2], values) <= MAX_MERGED_DOWNSCALE:
+            merged[-1] = (name, values)
+            sizes[-1] = next_size(name, values, sizes[-2])
+            notes.append(f'merged consecutive resizes into one to {int(values[0])}x{int(values[1])}')
+        else:
+            merged.append((name, values))
+            sizes.append(next_size(name, values, sizes[-1]))
+
+    return merged
+
+
+def can_resample_across(name: str, alpha: bool = False) -> bool:
+    info = operation_info(name)
+
+    # a step that rewrites alpha pixel by pixel (the gradient overlay makes it opaque wherever it is not zero)
+    # would see the edges the downscale softened and give a different mask
+    if alpha and info.touches_alpha and info.kind not in (GEOMETRIC, NEIGHBORHOOD):
+        return False
+
+    return info.resamplable and (info.kind != GEOMETRIC or name in ('rotate', 'flip'))
+
+
+def hoist_downscales(steps: list[Step], size: Size, notes: list[str], alpha: bool = False) -> list[Step]:
+    steps = list(steps)
+    sizes = [size]
+    for name, values in steps:
+        sizes.append(next_size(name, values, sizes[-1]))
+
+    for index in range(len(steps)):
+        name, values = steps[index]
+        before = sizes[index]
+        if name != 'resize' or int(values[0]) * int(values[1]) >= before[0] * before[1]:
+            continue
+
+        # a downscale moves ahead of every step that can run on fewer pixels, whose pixel-sized parameters shrink with it
+        factor = math.sqrt(int(values[0]) * int(values[1]) / (before[0] * before[1]))
+        position, width, height, passed = index, int(values[0]), int(values[1]), []
+
+        while position > 0 and can_resample_across(steps[position - 1][0], alpha):
+            previous_name, previous_values = steps[position - 1]
+            if previous_name == 'rotate':
+                width, height = height, width
+
+            steps[position] = (previous_name, scale_values(previous_name, previous_values, factor))
+            steps[position - 1] = ('resize', [width, height])
+            passed.append(previous_name)
+            position -= 1
+
+        if passed:
+            notes.append(f'moved resize to {width}x{height} ahead of {", ".join(reversed(passed))}')
+            sizes = [size]
+            for step_name, step_values in steps:
+                sizes.append(next_size(step_name, step_values, sizes[-1]))
+
+    return steps
+
+
+def plan_steps(steps: list[Step], width: int, height: int, alpha: bool = False) -> Plan:
+    notes = []
+    planned = merge_steps(expand(steps), (width, height), notes)
+    planned = hoist_downscales(planned, (width, height), notes, alpha)
+    planned = merge_steps(planned, (width, height), notes)
+
+    stages = fuse(planned)
+    for stage in stages:
+        passes = len(compile_tone(stage))
+        if 1 < len(stage) and passes < len(stage):
+            notes.append(f'fused {" + ".join(name for name, _ in stage)} into {passes} tone pass(es)')
+
+    return Plan(planned, notes, estimate_unplanned(steps, (width, height)), estimate(stages, (width, height)))
+
+
+def run_plan(image: np.ndarray, plan: Plan, cancel_event: Optional[Event] = None) -> np.ndarray:
+    return run_preset(image, plan.steps, image_processing_functions, cancel_event, BUFFERED_OPERATIONS)
@@ -0,0 +1,125 @@
+import numpy as np
+from threading import Event
+from typing import Callable, Optional
+from functions.tone_engine import PIXEL_OPERATIONS, TonePass, compile_tone, apply_tone
+from functions.buffer_pool import frame_pool
+from functions.profiling import span
+
+
+Step = tuple[str, Optional[list]]
+# takes the input and a destination buffer (or None), returns the result
+Stage = Callable[[np.ndarray, Optional[np.ndarray]], np.ndarray]
+# a stage, whether it can write into a destination buffer and its label for profiling
+CompiledStage = tuple[Stage, bool, str]
+
+
+class OperationCancelled(Exception):
+    pass
+
+
+def check_cancelled(cancel_event: Optional[Event]) -> None:
+    if cancel_event is not None and cancel_event.is_set():
+        raise OperationCancelled()
+
+
+def fused_stage(passes: list[TonePass]) -> Stage:
+    return lambda image, out: apply_tone(image, passes, out)
+
+
+def chained_stage(stages: list[Stage]) -> Stage:
+    def run(image: np.ndarray, out: Optional[np.ndarray]) -> np.ndarray:
+        for index, stage in enumerate(stages):
+            image = stage(image, out if index == len(stages) - 1 else None)
+
+        return image
+
+    return run
+
+
+def call_stage(image_func: Callable, values: Optional[list], buffered: bool) -> Stage:
+    if buffered:
+        return lambda image, out: image_func(image, values, out=out)
+
+    return lambda image, _: image_func(image, values)
+
+
+def fused_label(steps: list[Step]) -> str:
+    return ' + '.join(name for name, _ in steps)
+
+
+def pixel_stage(steps: list[Step], operations: dict[str, Callable], buffered_operations: tuple[str, ...]) -> CompiledStage:
+    # fusing only merges neighbours that share a colour space; when that saves no pass, e.g. HSV and
+    # RGB steps alternating, every step runs its own operation, which may be faster than a lookup table
+    passes = compile_tone(steps)
+    if len(passes) < len(steps):
+        return fused_stage(passes), True, fused_label(steps)
+
+    stages = [call_stage(operations[name], values, name in buffered_operations) for name, values in steps]
+    buffered = steps[-1][0] in buffered_operations
+
+    return chained_stage(stages), buffered, fused_label(steps)
+
+
+def compile_preset(steps: list[Step], operations: dict[str, Callable], buffered_operations: tuple[str, ...] = ()) -> list[CompiledStage]:
+    stages = []
+    pixel_steps = []
+
+    for name, values in steps:
+        if name in PIXEL_OPERATIONS:
+            pixel_steps.append((name, values))
+            continue
+
+        if pixel_steps:
+            stages.append(pixel_stage(pixel_steps, operations, buffered_operations))
+            pixel_steps = []
+
+        buffered = name in buffered_operations
+        stages.append((call_stage(operations[name], values, buffered), buffered, name))
+
+    if pixel_steps:
+        stages.append(pixel_stage(pixel_steps, operations, buffered_operations))
+
+    return stages
+
+
+def run_preset(
+        image: np.ndarray,
+        steps: list[Step],
+        operations: dict[str, Callable],
+        cancel_event: Optional[Event] = None,
+        buffered_operations: tuple[str, ...] = ()
+    ) -> np.ndarray:
+
+    stages = compile_preset(steps, operations, buffered_operations)
+    frames = []
+
+    try:
+        for index, (stage, buffered, label) in enumerate(stages):
+            check_cancelled(cancel_event)
+
+            # intermediate results ping-pong between two pooled frames,
+            # the final one is a fresh array owned by the caller
+            out = None
+            if buffered and index < len(stages) - 1 and frame_pool.enabled:
+                out = next((frame for frame in frames if frame.shape == image.shape and frame.dtype == image.dtype and not np.may_share_memory(frame, image)), None)
+                if out is None:
+                    out = frame_pool.acquire(image.shape, image.dtype)
+                    frames.append(out)
+            else:
+                frame_pool.count_unpooled()
+
+            with span(label, 'stage'):
+                image = stage(image, out)
+    finally:
+        for frame in frames:
+            if not np.may_share_memory(frame, image):
+                frame_pool.release(frame)
+
+    return image
+
+
+def run_chained(image: np.ndarray, steps: list[Step], operations: dict[str, Callable]) -> np.ndarray:
+    for name, values in steps:
+        image = operations[name](image, values)
+
+    return image
@@ -0,0 +1,90 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+
+tracing = False
+trace_events: list[dict] = []
+trace_lock = threading.Lock()
+trace_start = time.perf_counter()
+
+status_listener: Optional[Callable[[str], None]] = None
+
+
+class Span:
+    name: str
+    category: str
+    start: float
+    seconds: float
+
+    def __init__(self, name: str, category: str) -> None:
+        self.name = name
+        self.category = category
+        self.start = time.perf_counter()
+        self.seconds = 0.0
+
+    @property
+    def milliseconds(self) -> float:
+        return self.seconds * 1000
+
+
+def set_tracing(enabled: bool) -> None:
+    global tracing
+    tracing = enabled
+
+
+def clear_trace() -> None:
+    with trace_lock:
+        trace_events.clear()
+
+
+@contextmanager
+def span(name: str, category: str, **args) -> Iterator[Span]:
+    # spans are always timed, they only enter the timeline while tracing is on
+    current = Span(name, category)
+    try:
+        yield current
+    finally:
+        current.seconds = time.perf_counter() - current.start
+
+        if tracing:
+            event = {
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': (current.start - trace_start) * 1e6,
+                'dur': current.seconds * 1e6,
+                'pid': os.getpid(),
+                'tid': threading.get_ident(),
+                'args': args
+            }
+            with trace_lock:
+                trace_events.append(event)
+
+
+def export_trace(path: str) -> int:
+    with trace_lock:
+        events = list(trace_events)
+
+    thread_names = [
+        {'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': thread.ident, 'args': {'name': thread.name}}
+        for thread in threading.enumerate()
+    ]
+
+    with open(path, 'w') as file:
+        json.dump({'traceEvents': thread_names + events, 'displayTimeUnit': 'ms'}, file)
+
+    return len(events)
+
+
+def set_status_listener(listener: Optional[Callable[[str], None]]) -> None:
+    global status_listener
+    status_listener = listener
+
+
+def report(*spans: Span) -> None:
+    if status_listener is not None:
+        status_listener('   '.join(f'{current.name} {current.milliseconds:.0f} ms' for current in spans))
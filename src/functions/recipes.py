@@ -0,0 +1,158 @@
+import re
+import json
+import math
+import numpy as np
+from threading import Event
+from typing import Optional
+from functions.image_operations import image_processing_functions, apply_steps
+from functions.preset_compiler import Step
+
+
+RECIPE_VERSION = 1
+RECIPE_FORMAT = 'photo-editor-recipe'
+
+NUMBER = 'number'
+INTEGER = 'integer'
+SIZE = 'size'
+SEED = 'seed'
+FLAG = 'flag'
+COLOR = 'color'
+DIRECTION = 'direction'
+
+GRADIENT_DIRECTIONS = ('horizontal', 'vertical', 'diagonal', 'radial')
+COLOR_PATTERN = re.compile(r'#?[0-9a-fA-F]{6}')
+# smallest value of the integer kinds: a size is at least a pixel, seeds cannot be negative
+INTEGER_MINIMUMS = {INTEGER: None, SIZE: 1, SEED: 0}
+
+# the kinds of values each operation reads: the required ones, then optional ones that may be left off the end;
+# operations missing here take no values
+VALUE_KINDS = {
+    'flip': ((INTEGER,), ()),
+    'resize': ((SIZE, SIZE), ()),
+    'blur': ((NUMBER,), (FLAG,)),
+    'sharpen': ((NUMBER,), (NUMBER,)),
+    'color adjustments': ((NUMBER, NUMBER, NUMBER), ()),
+    'hue': ((NUMBER,), ()),
+    'brightness': ((NUMBER,), ()),
+    'saturation': ((NUMBER,), ()),
+    'contrast': ((NUMBER,), ()),
+    'solid overlay': ((COLOR, NUMBER), ()),
+    'gradient overlay': ((DIRECTION, COLOR, COLOR, NUMBER), ()),
+    'noise': ((NUMBER,), (SEED, FLAG)),
+    'vignette': ((NUMBER,), ()),
+    'vintage': ((NUMBER,), (SEED,)),
+    'retro': ((NUMBER,), ()),
+    'mojave': ((NUMBER,), ()),
+    'nostalgia': ((NUMBER,), ()),
+    'clean': ((NUMBER,), ()),
+    'neon': ((NUMBER,), ()),
+    'twilight': ((NUMBER,), ())
+}
+
+
+def recipe_from_steps(steps: list[Step]) -> dict:
+    return {
+        'format': RECIPE_FORMAT,
+        'version': RECIPE_VERSION,
+        'steps': [{'operation': name, 'values': values} for name, values in steps]
+    }
+
+
+def to_number(value) -> Optional[float]:
+    # the editor's text fields hand sizes over as strings, so numeric text is read as a number
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            return None
+
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        return None
+
+    return value
+
+
+def convert_value(value, kind: str):
+    # returns the value in the type the operation reads, or None when it is not a valid value of that kind
+    match kind:
+        case 'number':
+            return to_number(value)
+        case 'integer' | 'size' | 'seed':
+            number = to_number(value)
+            if number is None or number != int(number):
+                return None
+
+            minimum = INTEGER_MINIMUMS[kind]
+            return int(number) if minimum is None or number >= minimum else None
+        case 'flag':
+            return value if isinstance(value, bool) else to_number(value)
+        case 'color':
+            return value if isinstance(value, str) and COLOR_PATTERN.fullmatch(value) else None
+        case 'direction':
+            return value if isinstance(value, str) and value in GRADIENT_DIRECTIONS else None
+
+
+def check_values(name: str, values: Optional[list]) -> Optional[list]:
+    if values is None:
+        return None
+    if not isinstance(values, list):
+        raise ValueError(f'values of {name} must be a list')
+
+    required, optional = VALUE_KINDS.get(name, ((), ()))
+    if name not in VALUE_KINDS and values:
+        raise ValueError(f'{name} takes no values')
+    if not len(required) <= len(values) <= len(required) + len(optional):
+        expected = f'{len(required)} to {len(required) + len(optional)}' if optional else str(len(required))
+        raise ValueError(f'{name} expects {expected} value(s), got {len(values)}')
+
+    converted = []
+    for index, (value, kind) in enumerate(zip(values, required + optional)):
+        converted_value = convert_value(value, kind)
+        if converted_value is None:
+            raise ValueError(f'value {index + 1} of {name} is not a valid {kind}: {value!r}')
+        converted.append(converted_value)
+
+    return converted
+
+
+def steps_from_recipe(recipe: dict) -> list[Step]:
+    if not isinstance(recipe, dict) or recipe.get('format') != RECIPE_FORMAT:
+        raise ValueError('not a photo editor recipe')
+
+    version = recipe.get('version')
+    if not isinstance(version, int) or isinstance(version, bool) or not 1 <= version <= RECIPE_VERSION:
+        raise ValueError(f'unsupported recipe version: {version!r}')
+
+    if not isinstance(recipe.get('steps'), list):
+        raise ValueError('recipe steps must be a list')
+
+    steps = []
+    for index, step in enumerate(recipe['steps']):
+        if not isinstance(step, dict):
+            raise ValueError(f'step {index + 1} must be an object')
+
+        name, values = step.get('operation'), step.get('values')
+        if not isinstance(name, str) or name not in image_processing_functions:
+            raise ValueError(f'unknown operation: {name!r}')
+        steps.append((name, check_values(name, values)))
+
+    return steps
+
+
+def save_recipe(path: str, steps: list[Step]) -> None:
+    with open(path, 'w') as file:
+        json.dump(recipe_from_steps(steps), file, indent=2)
+
+
+def load_recipe(path: str) -> list[Step]:
+    with open(path) as file:
+        try:
+            recipe = json.load(file)
+        except json.JSONDecodeError as error:
+            raise ValueError(f'invalid recipe: {error}')
+
+    return steps_from_recipe(recipe)
+
+
+def replay_recipe(image: np.ndarray, steps: list[Step], scale: float = 1.0, cancel_event: Optional[Event] = None) -> np.ndarray:
+    return apply_steps(image, steps, scale, cancel_event)
@@ -0,0 +1,103 @@
+import os
+import math
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+
+TILE_SIZE = 1024
+TILING_THRESHOLD = 4_000_000
+
+# (top, left, full height, full width) of the tile being processed
+TileRegion = tuple[int, int, int, int]
+TileFunction = Callable[[np.ndarray, TileRegion], np.ndarray]
+# same, but also given the destination view to write into (or None)
+BufferedTileFunction = Callable[[np.ndarray, TileRegion, Optional[np.ndarray]], np.ndarray]
+
+tile_workers = os.cpu_count() or 1
+executor = None
+
+
+def set_tile_workers(workers: int) -> None:
+    global tile_workers, executor
+
+    if executor is not None:
+        executor.shutdown()
+        executor = None
+
+    tile_workers = max(1, workers)
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global executor
+
+    if executor is None:
+        executor = ThreadPoolExecutor(max_workers=tile_workers, thread_name_prefix='tile')
+
+    return executor
+
+
+def gaussian_halo(sigma: float) -> int:
+    return math.ceil(4 * sigma) + 4
+
+
+def tile_regions(height: int, width: int, tile_size: int) -> list[tuple[int, int, int, int]]:
+    return [
+        (top, left, min(top + tile_size, height), min(left + tile_size, width))
+        for top in range(0, height, tile_size)
+        for left in range(0, width, tile_size)
+    ]
+
+
+def call_tile(tile_func: Callable, tile: np.ndarray, region: TileRegion, tile_out: Optional[np.ndarray], buffered: bool) -> np.ndarray:
+    if buffered:
+        return tile_func(tile, region, tile_out)
+
+    return tile_func(tile, region)
+
+
+def run_tiled(
+        image: np.ndarray,
+        tile_func: TileFunction | BufferedTileFunction,
+        halo: int = 0,
+        tile_size: int = TILE_SIZE,
+        threshold: int = TILING_THRESHOLD,
+        out: Optional[np.ndarray] = None,
+        buffered: bool = False
+    ) -> np.ndarray:
+
+    height, width = image.shape[:2]
+
+    if height * width < threshold:
+        return call_tile(tile_func, image, (0, 0, height, width), out, buffered)
+
+    output = out
+
+    def process(tile: tuple[int, int, int, int]) -> None:
+        nonlocal output
+        top, left, bottom, right = tile
+
+        # neighbourhood operations read a halo around the tile so the stitched edges match a whole-image run
+        halo_top, halo_left = max(0, top - halo), max(0, left - halo)
+        halo_bottom, halo_right = min(height, bottom + halo), min(width, right + halo)
+
+        # without a halo a buffered tile function writes straight into its part of the output
+        tile_out = output[top:bottom, left:right] if output is not None and halo == 0 else None
+
+        result = call_tile(tile_func, image[halo_top:halo_bottom, halo_left:halo_right], (halo_top, halo_left, height, width), tile_out, buffered)
+        if output is None:
+            output = np.empty((height, width) + result.shape[2:], dtype=result.dtype)
+
+        if result is not tile_out:
+            output[top:bottom, left:right] = result[top - halo_top:bottom - halo_top, left - halo_left:right - halo_left]
+
+    tiles = tile_regions(height, width, tile_size)
+    process(tiles[0])
+
+    if tile_workers == 1:
+        for tile in tiles[1:]:
+            process(tile)
+    else:
+        list(get_executor().map(process, tiles[1:]))
+
+    return output
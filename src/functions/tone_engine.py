@@ -0,0 +1,169 @@
+import numpy as np
+import cv2
+from typing import Optional
+from functions.tiling import run_tiled
+from functions.color_matrix import MATRIX_OPERATIONS, FOLDABLE_OPERATIONS, compile_matrix, fold_matrices, fold_saturation, apply_matrix
+
+
+HSV_OPERATIONS = ('hue', 'brightness', 'saturation')
+RGB_OPERATIONS = ('contrast', 'color adjustments', 'inversion')
+TONE_OPERATIONS = HSV_OPERATIONS + RGB_OPERATIONS
+PIXEL_OPERATIONS = TONE_OPERATIONS + MATRIX_OPERATIONS
+VALUELESS_OPERATIONS = ('inversion',) + MATRIX_OPERATIONS
+
+ToneStep = tuple[str, Optional[list]]
+TonePass = tuple[str, np.ndarray]
+
+
+def identity_lut() -> np.ndarray:
+    return np.repeat(np.arange(256, dtype=np.uint8).reshape(256, 1, 1), 3, axis=2)
+
+
+def compile_lut(name: str, values: Optional[list]) -> np.ndarray:
+    ramp = identity_lut()
+    ramp_float = ramp.astype(np.float64)
+
+    # every table is the original per-pixel formula evaluated on a 0..255 ramp,
+    # so a lookup reproduces the operation exactly
+    match name:
+        case 'hue':
+            ramp[:, :, 0] = (ramp_float[:, :, 0] + values[0]) % 180
+        case 'brightness':
+            ramp[:, :, 2] = np.clip(ramp_float[:, :, 2] + values[0], 0, 255)
+        case 'saturation':
+            ramp[:, :, 1] = np.clip(ramp_float[:, :, 1] * values[0], 0, 255)
+        case 'contrast':
+            contrast = values[0]
+            brightness = int(round(255 * (1 - contrast) / 2))
+            ramp = cv2.addWeighted(ramp, contrast, ramp, 0, brightness)
+        case 'color adjustments':
+            scaled = ramp.astype(np.float32) * np.array(values[:3], dtype=np.float32)
+            ramp = np.clip(scaled, 0, 255).astype(np.uint8)
+        case 'inversion':
+            ramp = 255 - ramp
+
+    return ramp
+
+
+def compose_luts(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    return np.take_along_axis(second, first.astype(np.intp), axis=0)
+
+
+def operation_space(name: str) -> str:
+    return 'hsv' if name in HSV_OPERATIONS else 'rgb'
+
+
+def leads_to_matrix(steps: list[ToneStep], index: int) -> bool:
+    for name, _ in steps[index:]:
+        if name in MATRIX_OPERATIONS:
+            return True
+        if name not in FOLDABLE_OPERATIONS:
+            return False
+
+    return False
+
+
+def compile_tone(steps: list[ToneStep]) -> list[TonePass]:
+    steps = [(name, values) for name, values in steps if values is not None or name in VALUELESS_OPERATIONS]
+    passes = []
+
+    for index, (name, values) in enumerate(steps):
+        last_space = passes[-1][0] if passes else None
+
+        # channel gains and inversion join a neighbouring colour matrix instead of costing a LUT pass
+        if name in MATRIX_OPERATIONS or (name in FOLDABLE_OPERATIONS and (last_space == 'matrix' or leads_to_matrix(steps, index))):
+            matrix = compile_matrix(name, values)
+            if last_space == 'matrix':
+                passes[-1] = ('matrix', fold_matrices(passes[-1][1], matrix))
+            else:
+                passes.append(('matrix', matrix))
+            continue
+
+        if name == 'saturation' and last_space == 'matrix':
+            folded = fold_saturation(passes[-1][1], values[0])
+            if folded is not None:
+                passes[-1] = ('matrix', folded)
+                continue
+
+        space = operation_space(name)
+        lut = compile_lut(name, values)
+
+        if np.array_equal(lut, identity_lut()):
+            continue
+
+        if last_space == space:
+            passes[-1] = (space, compose_luts(passes[-1][1], lut))
+        else:
+            passes.append((space, lut))
+
+    # a pass that maps every value onto itself only costs time, and in HSV a rounding round trip
+    return [tone_pass for tone_pass in passes if not is_identity(tone_pass)]
+
+
+def is_identity(tone_pass: TonePass) -> bool:
+    space, table = tone_pass
+    if space == 'matrix':
+        return np.array_equal(table, compile_matrix('color adjustments', [1, 1, 1]))
+
+    return np.array_equal(table, identity_lut())
+
+
+def hsv_codes(channels: int, shifts_hue: bool) -> tuple[int, int]:
+    # hue() has always converted RGB images as RGB, everything else goes through BGR;
+    # the round trip rounds differently for each order, so keep them as they were
+    if channels == 3 and shifts_hue:
+        return cv2.COLOR_RGB2HSV, cv2.COLOR_HSV2RGB
+
+    return cv2.COLOR_BGR2HSV, cv2.COLOR_HSV2BGR
+
+
+def apply_lut(image: np.ndarray, lut: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    if image.shape[2] == 4:
+        alpha_lut = np.arange(256, dtype=np.uint8).reshape(256, 1, 1)
+        lut = np.concatenate((lut, alpha_lut), axis=2)
+    elif (lut == lut[:, :, :1]).all():
+        lut = lut[:, :, 0].copy()
+
+    return cv2.LUT(image, lut, dst=out)
+
+
+def apply_hsv_lut(image: np.ndarray, lut: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    channels = image.shape[2]
+    shifts_hue = not np.array_equal(lut[:, 0, 0], np.arange(256))
+    to_hsv, from_hsv = hsv_codes(channels, shifts_hue)
+
+    hsv_image = cv2.cvtColor(image, to_hsv)
+    cv2.LUT(hsv_image, lut, dst=hsv_image)
+
+    if channels == 4:
+        adjusted_image = cv2.cvtColor(hsv_image, from_hsv, dst=out, dstCn=4)
+        adjusted_image[:, :, 3] = image[:, :, 3]
+        return adjusted_image
+
+    return cv2.cvtColor(hsv_image, from_hsv, dst=hsv_image if out is None else out)
+
+
+def apply_tone(image: np.ndarray, passes: list[TonePass], out: Optional[np.ndarray] = None) -> np.ndarray:
+    if not passes:
+        # nothing to do, but the caller still gets an array of its own
+        if out is None:
+            return image.copy()
+        np.copyto(out, image)
+        return out
+
+    return run_tiled(image, lambda tile, _, tile_out: apply_passes(tile, passes, tile_out), out=out, buffered=True)
+
+
+def apply_passes(image: np.ndarray, passes: list[TonePass], out: Optional[np.ndarray] = None) -> np.ndarray:
+    for index, (space, table) in enumerate(passes):
+        # only the last pass writes into the destination, earlier ones still read from the source
+        destination = out if index == len(passes) - 1 else None
+
+        if space == 'matrix':
+            image = apply_matrix(image, table, destination)
+        elif space == 'hsv':
+            image = apply_hsv_lut(image, table, destination)
+        else:
+            image = apply_lut(image, table, destination)
+
+    return image
@@ -0,0 +1,265 @@
+import math
+import threading
+import numpy as np
+import cv2
+from typing import Hashable, Optional
+from functions.display_encoder import cached_preview
+
+
+PYRAMID_TILE = 256
+MAX_ZOOM = 16.0
+
+# (top, left, bottom, right) in full resolution pixels
+Region = tuple[int, int, int, int]
+
+
+def halve(image: np.ndarray) -> np.ndarray:
+    # odd edges are replicated so every output pixel is the mean of its own 2x2 block,
+    # which lets a changed tile be reduced on its own
+    height, width = image.shape[:2]
+    if height % 2 or width % 2:
+        image = cv2.copyMakeBorder(image, 0, height % 2, 0, width % 2, cv2.BORDER_REPLICATE)
+
+    return cv2.resize(image, ((width + 1) // 2, (height + 1) // 2), interpolation=cv2.INTER_AREA)
+
+
+def level_region(region: Region, level: int) -> Region:
+    top, left, bottom, right = region
+    step = 1 << level
+    return top // step, left // step, -(-bottom // step), -(-right // step)
+
+
+def scale_region(region: Region, scale: float, shape: tuple[int, ...]) -> Region:
+    top, left, bottom, right = region
+    return (
+        min(math.floor(top * scale), shape[0] - 1),
+        min(math.floor(left * scale), shape[1] - 1),
+        min(max(math.ceil(bottom * scale), 1), shape[0]),
+        min(max(math.ceil(right * scale), 1), shape[1])
+    )
+
+
+def changed_tiles(old: np.ndarray, new: np.ndarray, tile_size: int = PYRAMID_TILE) -> list[Region]:
+    height, width = new.shape[:2]
+
+    return [
+        (top, left, min(top + tile_size, height), min(left + tile_size, width))
+        for top in range(0, height, tile_size)
+        for left in range(0, width, tile_size)
+        if not np.array_equal(old[top:top + tile_size, left:left + tile_size], new[top:top + tile_size, left:left + tile_size])
+    ]
+
+
+class ImagePyramid:
+    key: Optional[Hashable]
+    levels: list[np.ndarray]
+
+    def __init__(self) -> None:
+        self.key = None
+        self.levels = []
+
+    def update(self, key: Hashable, image: np.ndarray) -> None:
+        self.key = key
+        if not self.levels or self.levels[0].shape != image.shape:
+            self.levels = [image]
+            return
+
+        previous, self.levels[0] = self.levels[0], image
+        if len(self.levels) == 1 or previous is image:
+            return
+
+        # coarser levels that were already built are patched only where the image changed
+        regions = changed_tiles(previous, image)
+        for level in range(1, len(self.levels)):
+            finer, coarse = self.levels[level - 1], self.levels[level]
+            for region in regions:
+                top, left, bottom, right = level_region(region, level)
+                coarse[top:bottom, left:right] = halve(finer[top * 2:bottom * 2, left * 2:right * 2])
+
+    def clear(self) -> None:
+        self.key = None
+        self.levels = []
+
+    def level(self, index: int) -> np.ndarray:
+        # levels are built on first use, each from the one above it
+        while len(self.levels) <= index:
+            self.levels.append(halve(self.levels[-1]))
+
+        return self.levels[index]
+
+    def level_for(self, scale: float) -> int:
+        if scale >= 1.0:
+            return 0
+
+        height, width = self.levels[0].shape[:2]
+        deepest = max(0, math.floor(math.log2(min(height, width))))
+        return min(math.floor(math.log2(1 / scale)), deepest)
+
+
+class Viewport:
+    lock: threading.Lock
+    image: Optional[np.ndarray]
+    image_scale: float
+    key: Optional[Hashable]
+    pyramid: ImagePyramid
+    width: int
+    height: int
+    zoom: float
+    center_x: float
+    center_y: float
+
+    def __init__(self, width: int, height: int) -> None:
+        self.lock = threading.Lock()
+        self.image = None
+        self.image_scale = 1.0
+        self.key = None
+        self.pyramid = ImagePyramid()
+        self.width = width
+        self.height = height
+        self.zoom = 1.0
+        self.center_x = 0.0
+        self.center_y = 0.0
+
+    def set_image(self, key: Hashable, image: np.ndarray, scale: float = 1.0) -> None:
+        # the working image is shown until the full resolution of the same edit arrives;
+        # at scale 1 it is the full resolution
+        with self.lock:
+            reshaped = self.image is None or self.image.shape[:2] != image.shape[:2]
+            self.key = key
+            self.image = image
+            self.image_scale = scale
+
+            if scale == 1.0:
+                self.pyramid.update(key, image)
+
+            if reshaped:
+                self.reset_view()
+
+    def set_full_resolution(self, key: Hashable, image: np.ndarray) -> None:
+        with self.lock:
+            self.pyramid.update(key, image)
+
+    def full_resolution(self) -> tuple[Optional[Hashable], Optional[np.ndarray]]:
+        with self.lock:
+            return self.pyramid.key, self.pyramid.levels[0] if self.pyramid.levels else None
+
+    def clear(self) -> None:
+        with self.lock:
+            self.image = None
+            self.key = None
+            self.pyramid.clear()
+
+    def is_current(self) -> bool:
+        return self.pyramid.key is not None and self.pyramid.key == self.key
+
+    def full_size(self) -> tuple[int, int]:
+        if self.is_current():
+            height, width = self.pyramid.levels[0].shape[:2]
+            return width, height
+
+        height, width = self.image.shape[:2]
+        return max(1, round(width / self.image_scale)), max(1, round(height / self.image_scale))
+
+    def reset(self) -> None:
+        with self.lock:
+            if self.image is not None:
+                self.reset_view()
+
+    def reset_view(self) -> None:
+        width, height = self.full_size()
+        self.zoom = 1.0
+        self.center_x = width / 2
+        self.center_y = height / 2
+
+    def fit_scale(self) -> float:
+        width, height = self.full_size()
+        return min(1.0, self.width / width, self.height / height)
+
+    def region(self) -> tuple[Region, float]:
+        width, height = self.full_size()
+        scale = self.fit_scale() * self.zoom
+
+        visible_width = min(width, self.width / scale)
+        visible_height = min(height, self.height / scale)
+        self.center_x = min(max(self.center_x, visible_width / 2), width - visible_width / 2)
+        self.center_y = min(max(self.center_y, visible_height / 2), height - visible_height / 2)
+
+        left = max(0, math.floor(self.center_x - visible_width / 2))
+        top = max(0, math.floor(self.center_y - visible_height / 2))
+        right = min(width, math.ceil(self.center_x + visible_width / 2))
+        bottom = min(height, math.ceil(self.center_y + visible_height / 2))
+
+        return (top, left, bottom, right), scale
+
+    def display_size(self) -> tuple[int, int]:
+        with self.lock:
+            (top, left, bottom, right), scale = self.region()
+
+        return min(self.width, round((right - left) * scale)), min(self.height, round((bottom - top) * scale))
+
+    def needs_full_resolution(self) -> bool:
+        # zoomed in further than the working image can show
+        with self.lock:
+            return self.image is not None and self.fit_scale() * self.zoom > self.image_scale
+
+    def zoom_at(self, factor: float, x: float, y: float) -> None:
+        with self.lock:
+            if self.image is None:
+                return
+
+            (top, left, bottom, right), scale = self.region()
+            offset_x = (self.width - (right - left) * scale) / 2
+            offset_y = (self.height - (bottom - top) * scale) / 2
+
+            # the image point under the cursor stays under the cursor
+            point_x = left + (x - offset_x) / scale
+            point_y = top + (y - offset_y) / scale
+            self.zoom = min(max(self.zoom * factor, 1.0), MAX_ZOOM)
+            scale = self.fit_scale() * self.zoom
+            self.center_x = point_x + (self.width / 2 - x) / scale
+            self.center_y = point_y + (self.height / 2 - y) / scale
+
+    def pan(self, dx: float, dy: float) -> None:
+        with self.lock:
+            if self.image is None:
+                return
+
+            scale = self.fit_scale() * self.zoom
+            self.center_x -= dx / scale
+            self.center_y -= dy / scale
+
+    def visible(self) -> tuple[Hashable, np.ndarray]:
+        # live previews run on the working image
+        with self.lock:
+            region, _ = self.region()
+            top, left, bottom, right = scale_region(region, self.image_scale, self.image.shape)
+            return (self.key, region), self.image[top:bottom, left:right]
+
+    def render(self) -> tuple[str, int, int]:
+        with self.lock:
+            region, scale = self.region()
+
+            # the level closest above the display scale, picked relative to the full resolution
+            if self.is_current():
+                level = self.pyramid.level_for(scale)
+                top, left, bottom, right = level_region(region, level)
+                crop = self.pyramid.level(level)[top:bottom, left:right]
+            else:
+                level = None
+                top, left, bottom, right = scale_region(region, self.image_scale, self.image.shape)
+                crop = self.image[top:bottom, left:right]
+            key = self.key
+
+        height, width = region[2] - region[0], region[3] - region[1]
+        size = (min(self.width, round(width * scale)), min(self.height, round(height * scale)))
+
+        # only the visible region is resized and encoded; real pixels past 100% are magnified without smoothing,
+        # while the working image standing in for them is interpolated
+        if crop.shape[1] != size[0] or crop.shape[0] != size[1]:
+            if crop.shape[1] > size[0]:
+                interpolation = cv2.INTER_AREA
+            else:
+                interpolation = cv2.INTER_NEAREST if level is not None else cv2.INTER_LINEAR
+            crop = cv2.resize(crop, size, interpolation=interpolation)
+
+        return cached_preview((key, level, region, size), crop, size[0], size[1]), size[0], size[1]
@@ -0,0 +1,92 @@
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Hashable, Optional
+from functions.preset_compiler import OperationCancelled
+
+
+Task = Callable[[threading.Event], None]
+
+
+class Job:
+    key: Optional[Hashable]
+    task: Task
+    cancelled: bool
+
+    def __init__(self, key: Optional[Hashable], task: Task) -> None:
+        self.key = key
+        self.task = task
+        self.cancelled = False
+
+
+class BackgroundWorker:
+    executor: ThreadPoolExecutor
+    lock: threading.Lock
+    pending: dict[Hashable, Job]
+    queued: list[Job]
+    cancel_event: threading.Event
+    active: int
+    on_busy: Optional[Callable[[bool], None]]
+
+    def __init__(self) -> None:
+        # a single thread keeps jobs in submission order, so the edit graph is only touched by one job at a time
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='worker')
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.queued = []
+        self.cancel_event = threading.Event()
+        self.active = 0
+        self.on_busy = None
+
+    def submit(self, key: Optional[Hashable], task: Task) -> None:
+        with self.lock:
+            # a request that has not started yet is superseded by the newer one with the same key,
+            # but only while nothing was queued after it, otherwise the edits would run out of order
+            if key is not None and key in self.pending and self.queued[-1] is self.pending[key]:
+                self.pending[key].task = task
+                return
+
+            job = Job(key, task)
+            if key is not None:
+                self.pending[key] = job
+            self.queued.append(job)
+            self.active += 1
+            became_busy = self.active == 1
+
+        if became_busy:
+            self.notify(True)
+
+        self.executor.submit(self.run, job)
+
+    def run(self, job: Job) -> None:
+        with self.lock:
+            self.queued.remove(job)
+            if job.key is not None and self.pending.get(job.key) is job:
+                del self.pending[job.key]
+            self.cancel_event.clear()
+
+        try:
+            if not job.cancelled:
+                job.task(self.cancel_event)
+        except OperationCancelled:
+            pass
+        except Exception:
+            traceback.print_exc()
+        finally:
+            with self.lock:
+                self.active -= 1
+                became_idle = self.active == 0
+
+            if became_idle:
+                self.notify(False)
+
+    def cancel(self) -> None:
+        with self.lock:
+            for job in self.queued:
+                job.cancelled = True
+            self.pending.clear()
+            self.cancel_event.set()
+
+    def notify(self, busy: bool) -> None:
+        if self.on_busy is not None:
+            self.on_busy(busy)